@@ -4,6 +4,8 @@
 Shared configuration for CKAN metadata pipelines.
 """
 
+import os
+
 # User agent for all HTTP requests
 USER_AGENT = (
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
@@ -20,3 +22,7 @@ SESSION_HEADERS = {
     "Accept": "application/json, text/plain, */*",
     "x-cf-bypass": "ckan-ecosystem-bypass-2026",
 }
+
+# Max concurrent connections to one CKAN host; more than this just earns 429s.
+# Raise it via CKAN_MAX_PER_HOST for a self-hosted instance with more headroom.
+MAX_CONNECTIONS_PER_HOST = int(os.environ.get('CKAN_MAX_PER_HOST', 8))
@@ -8,7 +8,11 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import cloudscraper
 import pandas as pd
 import re
-from config import USER_AGENT, CKAN_BASE_URL, SESSION_HEADERS
+from concurrent.futures import ThreadPoolExecutor
+from config import USER_AGENT, CKAN_BASE_URL, SESSION_HEADERS, MAX_CONNECTIONS_PER_HOST
+
+PAGE_SIZE = 1000
+MAX_WORKERS = MAX_CONNECTIONS_PER_HOST  # Concurrent package_search page requests, one connection each
 
 class SimpleGitHubExtractor:
     def __init__(self):
@@ -45,49 +49,73 @@ class SimpleGitHubExtractor:
         
         return ""
     
+    def fetch_page(self, start, rows=PAGE_SIZE):
+        """Fetch one page of extension packages, returns the package_search result or None"""
+        print(f"Fetching batch starting at {start}...")
+        
+        response = self.session.get(
+            f"{self.api_base}/package_search",
+            params={
+                'fq': 'type:extension',
+                'start': start,
+                'rows': rows,
+                'sort': 'name asc',  # Stable order so concurrent pages don't overlap
+                'include_private': False
+            }
+        )
+        
+        if response.status_code != 200:
+            print(f"API failed with status {response.status_code} (start={start})")
+            return None
+        
+        data = response.json()
+        if not data.get('success'):
+            print(f"API returned error (start={start})")
+            return None
+        
+        return data['result']
+    
     def get_all_extensions(self):
         """Get all extensions with their GitHub URLs"""
         print("Fetching all extensions...")
         
-        all_packages = []
-        start = 0
-        rows = 1000
+        # The first page also gives the total count
+        first_page = self.fetch_page(0)
+        if first_page is None:
+            print("Error: could not fetch the first page of extensions")
+            sys.exit(1)
+        total_count = first_page.get('count', 0)
+        if total_count == 0:
+            print("No extensions found")
+            return []
         
-        while True:
-            print(f"Fetching batch starting at {start}...")
-            
-            response = self.session.get(
-                f"{self.api_base}/package_search",
-                params={
-                    'fq': 'type:extension',
-                    'start': start,
-                    'rows': rows,
-                    'include_private': False
-                }
-            )
-            
-            if response.status_code != 200:
-                print(f"API failed with status {response.status_code}")
-                break
-            
-            data = response.json()
-            if not data.get('success'):
-                print("API returned error")
-                break
-            
-            result = data['result']
-            batch_packages = result.get('results', [])
-            total_count = result.get('count', 0)
+        all_packages = list(first_page.get('results', []))
+        print(f"Fetched {len(all_packages)}/{total_count} extensions")
+        
+        # Remaining pages are independent, so fetch them concurrently
+        starts = list(range(PAGE_SIZE, total_count, PAGE_SIZE))
+        if starts:
+            failed_starts = []
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                for start, page in zip(starts, executor.map(self.fetch_page, starts)):
+                    if page is not None:
+                        all_packages.extend(page.get('results', []))
+                    else:
+                        failed_starts.append(start)
             
-            all_packages.extend(batch_packages)
+            # Give each failed page one more try before giving up
+            for start in list(failed_starts):
+                print(f"Retrying batch starting at {start}...")
+                page = self.fetch_page(start)
+                if page is not None:
+                    all_packages.extend(page.get('results', []))
+                    failed_starts.remove(start)
             
+            # A missing page would silently drop up to PAGE_SIZE extensions from the CSV
+            if failed_starts:
+                print(f"Error: could not fetch batches starting at {', '.join(map(str, failed_starts))}")
+                sys.exit(1)
             print(f"Fetched {len(all_packages)}/{total_count} extensions")
-            
-            # Stop if we got fewer results than requested or reached the total
-            if len(batch_packages) < rows or len(all_packages) >= total_count:
-                break
-                
-            start += rows
         
         print(f"Total extensions found: {len(all_packages)}")
         
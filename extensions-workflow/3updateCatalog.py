@@ -17,6 +17,7 @@ from config import USER_AGENT, CKAN_BASE_URL, SESSION_HEADERS
 # Configuration
 CKAN_API_BASE = f"{CKAN_BASE_URL}/api/3/action"
 CKAN_API_KEY = os.getenv('CKAN_API_KEY', 'CKAN_API_KEY')
+STATUS_INTERVAL = 0.5  # Minimum seconds between progress lines
 
 class CKANMetadataUpdater:
     def __init__(self, api_key: str, base_url: str = CKAN_BASE_URL):
@@ -33,17 +34,22 @@ class CKANMetadataUpdater:
         self.processed_count = 0
         self.error_count = 0
         self.start_time = datetime.now()
+        self._status_start = time.monotonic()
+        self._last_status = 0.0
 
     def print_status(self, current: int, total: int, package_name: str = ""):
-        """Print processing status with ETA"""
+        """Print processing status with ETA, at most every STATUS_INTERVAL seconds"""
+        now = time.monotonic()
         if current == 0:
-            self.start_time = datetime.now()
+            self._status_start = now
             print(f"Starting to process {total} packages...")
             return
+        if now - self._last_status < STATUS_INTERVAL and current != total:
+            return
+        self._last_status = now
             
-        elapsed = (datetime.now() - self.start_time).total_seconds()
-        rate = elapsed / current if current > 0 else 0
-        remaining = rate * (total - current)
+        elapsed = now - self._status_start
+        remaining = elapsed / current * (total - current)
         
         hours, remainder = divmod(int(remaining), 3600)
         minutes, seconds = divmod(remainder, 60)
@@ -8,32 +8,37 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import csv
+from itertools import islice
+
 import cloudscraper
-import pandas as pd
+import orjson
 from config import USER_AGENT, CKAN_BASE_URL, SESSION_HEADERS
 
-# Create a cloudscraper session for all requests
-scraper = cloudscraper.create_scraper()
-scraper.headers.update(SESSION_HEADERS)
-
 # Configuration
 CKAN_URL = CKAN_BASE_URL
 API_KEY = os.getenv('CKAN_API_KEY', 'CKAN_API_KEY')
 DATASET_ID = 'ckan-extensions-metadata'
 RESOURCE_NAME = 'CKAN Extensions Dynamic Metadata'
 CSV_FILE_PATH = 'dynamic_metadata_update.csv'
+CHUNK_SIZE = 5000  # Rows per datastore_upsert request
+
+# Create a cloudscraper session for all requests; the lookup and the upsert
+# share its pooled HTTPS connection and the Authorization header set here
+scraper = cloudscraper.create_scraper()
+scraper.headers.update(SESSION_HEADERS)
+scraper.headers['Authorization'] = API_KEY
+scraper.headers['Content-Type'] = 'application/json'
 
 def get_resource_id(dataset_id, resource_name):
     """Find resource ID by name"""
     
     package_show_url = f"{CKAN_URL}/api/3/action/package_show"
-    headers = {'Authorization': API_KEY}
     
     try:
         response = scraper.get(
             package_show_url,
-            params={'id': dataset_id},
-            headers=headers
+            params={'id': dataset_id}
         )
         
         if response.status_code == 200:
@@ -55,37 +60,14 @@ def get_resource_id(dataset_id, resource_name):
         print(f"✗ Error finding resource: {e}")
         return None
 
-def append_to_datastore(resource_id, csv_file):
-    """Simply append CSV data to datastore"""
-    
-    # Read CSV
-    print(f"\nReading CSV: {csv_file}")
-    try:
-        df = pd.read_csv(csv_file)
-        print(f"  Rows: {len(df)}")
-        print(f"  Columns: {', '.join(df.columns)}")
-    except Exception as e:
-        print(f"✗ Error reading CSV: {e}")
-        return False
+def post_records(resource_id, records):
+    """POST one batch of records to datastore_upsert"""
     
-    # Convert to records
-    records = df.to_dict(orient='records')
-    
-    # Clean None values
-    cleaned_records = []
-    for record in records:
-        cleaned_record = {k: v for k, v in record.items() if pd.notna(v)}
-        cleaned_records.append(cleaned_record)
-    
-    print(f"\nAppending {len(cleaned_records)} records to datastore...")
-    
-    # Append to datastore
     upsert_url = f"{CKAN_URL}/api/3/action/datastore_upsert"
-    headers = {'Authorization': API_KEY}
     
     data = {
         'resource_id': resource_id,
-        'records': cleaned_records,
+        'records': records,
         'method': 'insert',
         'force': True
     }
@@ -93,15 +75,13 @@ def append_to_datastore(resource_id, csv_file):
     try:
         response = scraper.post(
             upsert_url,
-            json=data,
-            headers=headers,
+            data=orjson.dumps(data),
             timeout=60
         )
         
         if response.status_code == 200:
             result = response.json()
             if result.get('success'):
-                print(f"✓ Successfully appended {len(cleaned_records)} records")
                 return True
             else:
                 print(f"✗ Failed: {result.get('error')}")
@@ -115,6 +95,41 @@ def append_to_datastore(resource_id, csv_file):
         print(f"✗ Error: {e}")
         return False
 
+def append_to_datastore(resource_id, csv_file):
+    """Append CSV data to datastore, CHUNK_SIZE rows per datastore_upsert call"""
+    
+    # Stream the CSV in chunks so memory and request size stay bounded
+    print(f"\nReading CSV: {csv_file}")
+    appended = 0
+    try:
+        with open(csv_file, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            print(f"  Columns: {', '.join(reader.fieldnames or [])}")
+            
+            chunk_number = 0
+            while True:
+                # Empty cells are left out so the datastore stores them as NULL
+                cleaned_records = [
+                    {k: v for k, v in row.items() if v != '' and v is not None}
+                    for row in islice(reader, CHUNK_SIZE)
+                ]
+                if not cleaned_records:
+                    break
+                chunk_number += 1
+                
+                print(f"\nAppending chunk {chunk_number} ({len(cleaned_records)} records) to datastore...")
+                if not post_records(resource_id, cleaned_records):
+                    print(f"✗ Stopped after appending {appended} records")
+                    return False
+                appended += len(cleaned_records)
+    except Exception as e:
+        print(f"✗ Error reading CSV: {e}")
+        print(f"✗ Stopped after appending {appended} records")
+        return False
+    
+    print(f"✓ Successfully appended {appended} records")
+    return True
+
 def main():
     """Main function"""
     
@@ -9,10 +9,11 @@ import os
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import requests
+import httpx
 import pandas as pd
 import json
 import logging
+import time
 from datetime import datetime
 from config import SESSION_HEADERS
 
@@ -32,14 +33,134 @@ RESOURCE_NAME = 'CKAN Extensions Dynamic Metadata'
 CSV_FILE_PATH = 'dynamic_metadata_update.csv'
 UNIQUE_COLUMNS = ['repository_name', 'tstamp']  # Columns to check for duplicates
 
+# Datastore field types for the columns written by 2refresh.py
+FIELD_SCHEMA = {
+    'tstamp': 'timestamp',
+    'repository_name': 'text',
+    'url': 'text',
+    'forks_count': 'int',
+    'total_releases': 'int',
+    'latest_release': 'text',
+    'release_date': 'timestamp',
+    'stars': 'int',
+    'open_issues': 'int',
+    'contributors_count': 'int',
+    'discussions': 'bool'
+}
+TIMESTAMP_COLUMNS = [col for col, field_type in FIELD_SCHEMA.items() if field_type == 'timestamp']
+INT_COLUMNS = [col for col, field_type in FIELD_SCHEMA.items() if field_type == 'int']
+
+# Shared HTTP/2 client: every call multiplexes over one TLS connection
+client = httpx.Client(
+    http2=True,
+    limits=httpx.Limits(max_connections=16, max_keepalive_connections=16),
+    timeout=60.0
+)
+
+# Retry transient failures with exponential backoff (1s, 2s, 4s, ...)
+MAX_RETRIES = 5
+BACKOFF_FACTOR = 1.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Rows serialized per chunk of a streamed datastore request body
+BODY_BATCH_ROWS = 1000
+
+def infer_field_type(dtype):
+    """Map a pandas dtype to a datastore field type"""
+    dtype = str(dtype)
+    if 'int' in dtype:
+        return 'int'
+    if 'float' in dtype:
+        return 'numeric'
+    if 'bool' in dtype:
+        return 'bool'
+    return 'text'
+
+def build_fields(df):
+    """Build datastore field definitions, inferring only unknown columns"""
+    return [
+        {'id': col, 'type': FIELD_SCHEMA.get(col) or infer_field_type(df[col].dtype)}
+        for col in df.columns
+    ]
+
+def prepare_df_for_ckan(df):
+    """Format columns in place to match FIELD_SCHEMA for the datastore
+
+    Columns that are already datetime64 go straight to a vectorized
+    strftime. Strings (plain dates, or ISO timestamps produced by
+    filter_duplicates) are parsed first; values such as 'No releases'
+    become null. Int columns that picked up NaN (and so became float)
+    are cast to nullable Int64, so they serialize as 0 rather than 0.0.
+    """
+    for col in set(TIMESTAMP_COLUMNS) & set(df.columns):
+        if not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], format='ISO8601', errors='coerce')
+        df[col] = df[col].dt.strftime('%Y-%m-%dT%H:%M:%S')
+    for col in set(INT_COLUMNS) & set(df.columns):
+        df[col] = pd.to_numeric(df[col], errors='coerce').round().astype('Int64')
+
+def iter_json_body(data, df):
+    """Yield a JSON request body for data plus the dataframe as 'records'
+
+    Rows are serialized by pandas' C JSON encoder in batches (NaN becomes
+    null), so no per-row Python dicts are built and the full JSON document
+    is never held in memory; httpx sends the generator chunked.
+    """
+    yield json.dumps(data)[:-1].encode('utf-8') + b', "records": ['
+    for start in range(0, len(df), BODY_BATCH_ROWS):
+        batch = df.iloc[start:start + BODY_BATCH_ROWS].to_json(orient='records', double_precision=15)
+        if start:
+            yield b','
+        yield batch[1:-1].encode('utf-8')
+    yield b']}'
+
+def request_with_retry(method, url, content_factory=None, idempotent=True, **kwargs):
+    """Send a request through the shared client, retrying transient failures
+
+    Non-idempotent calls (datastore inserts) are only retried when the
+    connection failed or the server rate limited us, so records are never
+    inserted twice. content_factory is called on every attempt so that
+    streamed bodies can be replayed.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        last_attempt = attempt == MAX_RETRIES
+        delay = BACKOFF_FACTOR * 2 ** attempt
+        if content_factory is not None:
+            kwargs['content'] = content_factory()
+        
+        try:
+            response = client.request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            not_sent = isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+            if last_attempt or not (idempotent or not_sent):
+                raise
+            reason = str(e)
+        else:
+            status = response.status_code
+            retryable = status == 429 or (idempotent and status in RETRY_STATUSES)
+            if last_attempt or not retryable:
+                return response
+            reason = f"HTTP {status}"
+            retry_after = response.headers.get('Retry-After', '')
+            if retry_after.isdigit():
+                delay = int(retry_after)
+        
+        logger.warning(f"{method} {url} failed ({reason}), retry {attempt + 1}/{MAX_RETRIES} in {delay}s")
+        time.sleep(delay)
+
 def get_resource_info(dataset_id, resource_name):
-    """Find resource by name and check if it has datastore"""
+    """Find resource by name and check if it has datastore
+
+    When the dataset exists but has no matching resource, the returned
+    dict has 'id' set to None so callers can still use 'package_id'.
+    """
 
     package_show_url = f"{CKAN_URL}/api/3/action/package_show"
     headers = {**SESSION_HEADERS, 'Authorization': API_KEY}
     
     try:
-        response = requests.get(
+        response = request_with_retry(
+            'GET',
             package_show_url,
             params={'id': dataset_id},
             headers=headers
@@ -65,7 +186,11 @@ def get_resource_info(dataset_id, resource_name):
                         }
                 
                 print(f"No resource found matching '{resource_name}'")
-                return None
+                return {
+                    'id': None,
+                    'has_datastore': False,
+                    'package_id': dataset['id']
+                }
                 
     except Exception as e:
         print(f"Error finding resource: {e}")
@@ -92,7 +217,8 @@ def download_existing_data(resource_id, limit=100000):
                 'offset': offset
             }
             
-            response = requests.post(
+            response = request_with_retry(
+                'POST',
                 search_url,
                 json=params,
                 headers=headers,
@@ -144,24 +270,26 @@ def filter_duplicates(new_df, existing_df, unique_columns):
     print(f"  Checking for duplicates based on: {', '.join(unique_columns)}")
     
     # Ensure unique columns exist in both dataframes
-    for col in unique_columns:
-        if col not in new_df.columns:
-            print(f"  Warning: Column '{col}' not in new data")
-            return new_df, new_df.copy()
-        if col not in existing_df.columns:
-            print(f"  Warning: Column '{col}' not in existing data")
-            return new_df, new_df.copy()
-    
-    # Convert timestamps to strings for comparison if they exist
+    missing_new = set(unique_columns) - set(new_df.columns)
+    if missing_new:
+        print(f"  Warning: Column(s) not in new data: {', '.join(sorted(missing_new))}")
+        return new_df, new_df.copy()
+    missing_existing = set(unique_columns) - set(existing_df.columns)
+    if missing_existing:
+        print(f"  Warning: Column(s) not in existing data: {', '.join(sorted(missing_existing))}")
+        return new_df, new_df.copy()
+    
+    # Normalize timestamps to one string format for comparison. No dtype check:
+    # string columns are 'object' on pandas 2 but 'str' on pandas 3, and columns
+    # that are already datetimes need the same formatting
+    date_cols = set(unique_columns) & set(TIMESTAMP_COLUMNS)
     for df in [new_df, existing_df]:
-        for col in unique_columns:
-            if col in df.columns and df[col].dtype == 'object':
-                # Try to normalize timestamp format
-                try:
-                    df[col] = pd.to_datetime(df[col], format='%Y-%m-%d', errors='coerce')
-                    df[col] = df[col].dt.strftime('%Y-%m-%dT%H:%M:%S')
-                except:
-                    pass
+        for col in date_cols:
+            try:
+                df[col] = pd.to_datetime(df[col], format='ISO8601', errors='coerce')
+                df[col] = df[col].dt.strftime('%Y-%m-%dT%H:%M:%S')
+            except:
+                pass
     
     # Create composite key for comparison
     new_df['_composite_key'] = new_df[unique_columns].astype(str).agg('-'.join, axis=1)
@@ -208,24 +336,8 @@ def append_to_datastore(resource_id, df):
     
     print(f"\nInserting {len(new_records_df)} new records...")
     
-    # Convert datetime columns to ISO format strings
-    for col in ['tstamp', 'release_date']:
-        if col in new_records_df.columns:
-            new_records_df[col] = pd.to_datetime(new_records_df[col], format='%Y-%m-%d', errors='coerce')
-            new_records_df[col] = new_records_df[col].dt.strftime('%Y-%m-%dT%H:%M:%S')
-    
-    # Convert dataframe to records and clean
-    records = new_records_df.to_dict(orient='records')
-    cleaned_records = []
-    for record in records:
-        cleaned_record = {}
-        for k, v in record.items():
-            if pd.notna(v) and v is not None:
-                # Convert numpy types to Python native types
-                if hasattr(v, 'item'):
-                    v = v.item()
-                cleaned_record[k] = v
-        cleaned_records.append(cleaned_record)
+    # Convert datetime columns to ISO format strings and int columns back to ints
+    prepare_df_for_ckan(new_records_df)
     
     # Use datastore_upsert with 'insert' method (doesn't require primary key)
     upsert_url = f"{CKAN_URL}/api/3/action/datastore_upsert"
@@ -233,25 +345,26 @@ def append_to_datastore(resource_id, df):
     
     data = {
         'resource_id': resource_id,
-        'records': cleaned_records,
         'method': 'insert',  # Use 'insert' instead of 'upsert' (no primary key needed)
         'force': True,
         'calculate_record_count': True
     }
     
     try:
-        response = requests.post(
+        response = request_with_retry(
+            'POST',
             upsert_url,
-            json=data,
-            headers=headers,
+            content_factory=lambda: iter_json_body(data, new_records_df),
+            idempotent=False,
+            headers={**headers, 'Content-Type': 'application/json'},
             timeout=60
         )
         
         if response.status_code == 200:
             result = response.json()
             if result.get('success'):
-                print(f"✓ Successfully inserted {len(cleaned_records)} new records")
-                logger.info(f"Inserted {len(cleaned_records)} records to resource {resource_id}")
+                print(f"✓ Successfully inserted {len(new_records_df)} new records")
+                logger.info(f"Inserted {len(new_records_df)} records to resource {resource_id}")
                 
                 if len(duplicates_df) > 0:
                     print(f"  (Skipped {len(duplicates_df)} duplicate records)")
@@ -284,7 +397,8 @@ def create_datastore_without_primary_key(resource_id, df):
     headers = {**SESSION_HEADERS, 'Authorization': API_KEY}
     
     try:
-        response = requests.post(
+        response = request_with_retry(
+            'POST',
             delete_url,
             json={'resource_id': resource_id, 'force': True},
             headers=headers
@@ -295,43 +409,10 @@ def create_datastore_without_primary_key(resource_id, df):
         pass
     
     # Prepare fields
-    fields = []
-    for col in df.columns:
-        dtype = str(df[col].dtype)
-        
-        if 'int' in dtype:
-            field_type = 'int'
-        elif 'float' in dtype:
-            field_type = 'numeric'
-        elif 'bool' in dtype:
-            field_type = 'bool'
-        elif col in ['tstamp', 'release_date']:
-            field_type = 'timestamp'
-        else:
-            field_type = 'text'
-        
-        fields.append({
-            'id': col,
-            'type': field_type
-        })
-    
-    # Convert datetime columns
-    for col in ['tstamp', 'release_date']:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], format='%Y-%m-%d', errors='coerce')
-            df[col] = df[col].dt.strftime('%Y-%m-%dT%H:%M:%S')
-    
-    # Convert to records
-    records = df.to_dict(orient='records')
-    cleaned_records = []
-    for record in records:
-        cleaned_record = {}
-        for k, v in record.items():
-            if pd.notna(v) and v is not None:
-                if hasattr(v, 'item'):
-                    v = v.item()
-                cleaned_record[k] = v
-        cleaned_records.append(cleaned_record)
+    fields = build_fields(df)
+    
+    # Convert datetime and int columns
+    prepare_df_for_ckan(df)
     
     # Create datastore WITHOUT primary key
     datastore_create_url = f"{CKAN_URL}/api/3/action/datastore_create"
@@ -340,24 +421,25 @@ def create_datastore_without_primary_key(resource_id, df):
     data = {
         'resource_id': resource_id,
         'fields': fields,
-        'records': cleaned_records,
         'force': True,
         'calculate_record_count': True
         # NOTE: No primary_key specified!
     }
     
     try:
-        response = requests.post(
+        response = request_with_retry(
+            'POST',
             datastore_create_url,
-            json=data,
-            headers=headers,
+            content_factory=lambda: iter_json_body(data, df),
+            idempotent=False,
+            headers={**headers, 'Content-Type': 'application/json'},
             timeout=60
         )
         
         if response.status_code == 200:
             result = response.json()
             if result.get('success'):
-                print(f"✓ Datastore created with {len(cleaned_records)} records")
+                print(f"✓ Datastore created with {len(df)} records")
                 return True
             else:
                 print(f"✗ Failed: {result.get('error')}")
@@ -375,42 +457,10 @@ def create_resource_with_datastore(package_id, df):
     
     print("Creating new resource with datastore...")
     
-    fields = []
-    for col in df.columns:
-        dtype = str(df[col].dtype)
-        
-        if 'int' in dtype:
-            field_type = 'int'
-        elif 'float' in dtype:
-            field_type = 'numeric'
-        elif 'bool' in dtype:
-            field_type = 'bool'
-        elif col in ['tstamp', 'release_date']:
-            field_type = 'timestamp'
-        else:
-            field_type = 'text'
-        
-        fields.append({
-            'id': col,
-            'type': field_type
-        })
-    
-    # Convert datetime columns
-    for col in ['tstamp', 'release_date']:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], format='%Y-%m-%d', errors='coerce')
-            df[col] = df[col].dt.strftime('%Y-%m-%dT%H:%M:%S')
-    
-    records = df.to_dict(orient='records')
-    cleaned_records = []
-    for record in records:
-        cleaned_record = {}
-        for k, v in record.items():
-            if pd.notna(v) and v is not None:
-                if hasattr(v, 'item'):
-                    v = v.item()
-                cleaned_record[k] = v
-        cleaned_records.append(cleaned_record)
+    fields = build_fields(df)
+    
+    # Convert datetime and int columns
+    prepare_df_for_ckan(df)
     
     datastore_create_url = f"{CKAN_URL}/api/3/action/datastore_create"
     headers = {**SESSION_HEADERS, 'Authorization': API_KEY}
@@ -427,17 +477,18 @@ def create_resource_with_datastore(package_id, df):
     data = {
         'resource': resource,
         'fields': fields,
-        'records': cleaned_records,
         'force': True,
         'calculate_record_count': True
         # No primary_key!
     }
     
     try:
-        response = requests.post(
+        response = request_with_retry(
+            'POST',
             datastore_create_url,
-            json=data,
-            headers=headers,
+            content_factory=lambda: iter_json_body(data, df),
+            idempotent=False,
+            headers={**headers, 'Content-Type': 'application/json'},
             timeout=60
         )
         
@@ -471,7 +522,8 @@ def update_resource_metadata(resource_id):
     }
     
     try:
-        response = requests.post(
+        response = request_with_retry(
+            'POST',
             resource_patch_url,
             json=data,
             headers=headers
@@ -512,17 +564,17 @@ def main():
         return False
     
     # Validate unique columns exist
-    for col in UNIQUE_COLUMNS:
-        if col not in df.columns:
-            print(f"✗ ERROR: Unique column '{col}' not found in CSV!")
-            return False
+    missing = set(UNIQUE_COLUMNS) - set(df.columns)
+    if missing:
+        print(f"✗ ERROR: Unique column(s) not found in CSV: {', '.join(sorted(missing))}")
+        return False
     
     print()
     
     # Check if resource exists
     resource_info = get_resource_info(DATASET_ID, RESOURCE_NAME)
     
-    if resource_info:
+    if resource_info and resource_info['id']:
         resource_id = resource_info['id']
         
         if resource_info['has_datastore']:
@@ -540,27 +592,13 @@ def main():
         # Create new resource with datastore
         print("Resource not found, creating new resource with datastore...")
         
-        try:
-            package_show_url = f"{CKAN_URL}/api/3/action/package_show"
-            headers = {**SESSION_HEADERS, 'Authorization': API_KEY}
-            
-            response = requests.get(
-                package_show_url,
-                params={'id': DATASET_ID},
-                headers=headers
-            )
-            
-            if response.status_code != 200:
-                print(f"✗ Dataset '{DATASET_ID}' not found")
-                return False
-            
-            package = response.json()['result']
-            resource_id = create_resource_with_datastore(package['id'], df)
-            
-            success = resource_id is not None
-        except Exception as e:
-            print(f"✗ Error: {e}")
+        # package_show was already done by get_resource_info
+        if not resource_info:
+            print(f"✗ Dataset '{DATASET_ID}' not found")
             return False
+        
+        resource_id = create_resource_with_datastore(resource_info['package_id'], df)
+        success = resource_id is not None
     
     if success:
         print(f"\n✓ Time-series data successfully appended!")
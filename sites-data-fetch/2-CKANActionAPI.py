@@ -1,16 +1,17 @@
 import csv
 import json
 import cloudscraper
-import time
 import logging
 import backoff
 import argparse
 import os
 from pathlib import Path
 from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 INPUT_CSV_FILE  = "1.csv"
 OUTPUT_CSV_FILE = "2.csv"
+MAX_WORKERS     = 10  # Sites processed concurrently; each is a different host
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -45,11 +46,11 @@ class CKANMetadataExtractor:
             url = 'https://' + url
         return url.rstrip('/')
 
-    def make_api_call(self, base_url: str, endpoint: str):
+    def make_api_call(self, base_url: str, endpoint: str, params: dict = None):
         """Call a CKAN API endpoint, return parsed JSON or None on failure."""
         api_url = urljoin(base_url + '/', f'api/3/action/{endpoint}')
         try:
-            response = _get(self.session, api_url, timeout=30, verify=False)
+            response = _get(self.session, api_url, params=params, timeout=30, verify=False)
             response.raise_for_status()
             data = response.json()
             if data.get('success', False):
@@ -68,7 +69,19 @@ class CKANMetadataExtractor:
 
         result = self.get_empty_result()
 
-        status_data = self.make_api_call(normalized_url, 'status_show')
+        # The endpoints are independent, so call them concurrently.
+        # package_search?rows=0 returns just the dataset count, where package_list
+        # would download every dataset name only for us to take len()
+        calls = {
+            'status_show': None,
+            'group_list': None,
+            'organization_list': None,
+            'package_search': {'rows': 0},
+        }
+        with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+            futures = {e: executor.submit(self.make_api_call, normalized_url, e, params) for e, params in calls.items()}
+        status_data, group_data, org_data, package_data = (futures[e].result() for e in calls)
+
         if status_data and status_data.get('result'):
             api_result = status_data['result']
             result['ckan_version']    = str(api_result.get('ckan_version', ''))
@@ -80,23 +93,19 @@ class CKANMetadataExtractor:
             extensions = api_result.get('extensions', [])
             result['extensions'] = ', '.join(extensions) if isinstance(extensions, list) else str(extensions or '')
 
-        time.sleep(1)
-
-        group_data = self.make_api_call(normalized_url, 'group_list')
         if group_data and isinstance(group_data.get('result'), list):
             result['num_groups'] = str(len(group_data['result']))
 
-        time.sleep(1)
-
-        org_data = self.make_api_call(normalized_url, 'organization_list')
         if org_data and isinstance(org_data.get('result'), list):
             result['num_organizations'] = str(len(org_data['result']))
 
-        time.sleep(1)
-
-        package_data = self.make_api_call(normalized_url, 'package_list')
-        if package_data and isinstance(package_data.get('result'), list):
-            result['num_datasets'] = str(len(package_data['result']))
+        if package_data and isinstance(package_data.get('result'), dict) and 'count' in package_data['result']:
+            result['num_datasets'] = str(package_data['result']['count'])
+        else:
+            # Very old or locked-down instances may not expose package_search
+            package_data = self.make_api_call(normalized_url, 'package_list')
+            if package_data and isinstance(package_data.get('result'), list):
+                result['num_datasets'] = str(len(package_data['result']))
 
         return result
 
@@ -107,7 +116,21 @@ class CKANMetadataExtractor:
             'num_groups': '0', 'num_organizations': '0', 'num_datasets': '0'
         }
 
-    def process_csv(self, input_file: str, output_file: str, rows: int = None):
+    def process_row(self, row: dict) -> dict:
+        """Return a copy of row with the site's metadata filled in."""
+        url = row.get('url', '').strip()
+        processed_row = row.copy()
+        if url:
+            try:
+                processed_row.update(self.process_ckan_instance(url))
+            except Exception as e:
+                logger.error(f"Failed on {url}: {e}")
+                processed_row.update(self.get_empty_result())
+        else:
+            processed_row.update(self.get_empty_result())
+        return processed_row
+
+    def process_csv(self, input_file: str, output_file: str, rows: int = None, workers: int = MAX_WORKERS):
         """Process CSV. Supports resume (skips URLs already present in output)."""
 
         # ── Load input ───────────────────────────────────────────────────────
@@ -128,10 +151,7 @@ class CKANMetadataExtractor:
             'ckan_version', 'description', 'api_title', 'contact_email',
             'primary_language', 'extensions', 'num_groups', 'num_organizations', 'num_datasets'
         ]
-        final_fieldnames = original_fieldnames.copy()
-        for col in metadata_columns:
-            if col not in final_fieldnames:
-                final_fieldnames.append(col)
+        final_fieldnames = list(dict.fromkeys(original_fieldnames + metadata_columns))
 
         # ── Resume support ───────────────────────────────────────────────────
         processed_urls = set()
@@ -143,36 +163,29 @@ class CKANMetadataExtractor:
 
         mode = 'a' if processed_urls else 'w'
 
-        logger.info(f"Processing {len(all_rows)} rows...")
+        pending = []
+        for row in all_rows:
+            url = row.get('url', '').strip()
+            if url and url in processed_urls:
+                continue
+            pending.append(row)
 
-        # ── Process rows incrementally ───────────────────────────────────────
+        logger.info(f"Processing {len(pending)} of {len(all_rows)} rows with {workers} workers...")
+
+        # ── Process rows concurrently, writing each as it completes ──────────
+        # Rows land in completion order; resume only relies on the url set.
         with open(output_file, mode, encoding='utf-8', newline='') as f:
             writer = csv.DictWriter(f, fieldnames=final_fieldnames)
             if not processed_urls:
                 writer.writeheader()
 
-            for i, row in enumerate(all_rows, 1):
-                url = row.get('url', '').strip()
-
-                if url and url in processed_urls:
-                    continue
-
-                logger.info(f"Row {i}/{len(all_rows)}: {url or '(empty)'}")
-
-                processed_row = row.copy()
-                if url:
-                    try:
-                        metadata = self.process_ckan_instance(url)
-                        processed_row.update(metadata)
-                    except Exception as e:
-                        logger.error(f"Failed on {url}: {e}")
-                        processed_row.update(self.get_empty_result())
-                else:
-                    processed_row.update(self.get_empty_result())
-
-                writer.writerow(processed_row)
-                f.flush()
-                time.sleep(5)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(self.process_row, row) for row in pending]
+                for i, future in enumerate(as_completed(futures), 1):
+                    processed_row = future.result()
+                    logger.info(f"Row {i}/{len(pending)} done: {processed_row.get('url', '').strip() or '(empty)'}")
+                    writer.writerow(processed_row)
+                    f.flush()
 
         logger.info(f"Done. Results saved to {output_file}")
 
@@ -185,6 +198,8 @@ def parse_args():
                         help='Maximum number of rows to process')
     parser.add_argument('--input',  default=INPUT_CSV_FILE,  help='Input CSV file')
     parser.add_argument('--output', default=OUTPUT_CSV_FILE, help='Output CSV file')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS,
+                        help='Number of sites to process concurrently')
     return parser.parse_args()
 
 
@@ -204,7 +219,7 @@ def main():
 
     try:
         extractor = CKANMetadataExtractor()
-        extractor.process_csv(args.input, args.output, rows=args.rows)
+        extractor.process_csv(args.input, args.output, rows=args.rows, workers=args.workers)
         print(f"\nSuccess! Results saved to: {args.output}")
     except Exception as e:
         print(f"ERROR: {str(e)}")
@@ -2,7 +2,7 @@
 """
 Merge new ckan_stats.csv into the existing CKAN resource file in-place:
   1. Download the current resource CSV from CKAN
-  2. Append new rows (dedup on name + tstamp)
+  2. Append new rows on disk (no dedup — every run is a new snapshot)
   3. Upload the merged CSV back via resource_update (preserves resource ID/UUID)
 """
 
@@ -10,10 +10,12 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import io
+import csv
+import shutil
 import logging
+import tempfile
 import cloudscraper
-import pandas as pd
+from requests_toolbelt import MultipartEncoder
 from datetime import datetime, UTC
 from config import CKAN_BASE_URL, SESSION_HEADERS
 
@@ -28,6 +30,9 @@ CKAN_URL = CKAN_BASE_URL
 API_KEY = os.getenv('CKAN_API_KEY', '')
 RESOURCE_ID = 'efa7d10b-4259-4dc7-bf40-36a9172b268e'
 NEW_STATS_FILE = 'ckan_stats.csv'
+UNIQUE_COLUMNS = ['name', 'tstamp']  # Must be present in the new stats file
+CHUNK_ROWS = 50_000  # Rows per chunk when columns differ and pandas has to realign them
+COPY_BUFFER = 1024 * 1024
 
 scraper = cloudscraper.create_scraper()
 scraper.headers.update(SESSION_HEADERS)
@@ -54,50 +59,90 @@ def get_resource_info() -> dict | None:
         return None
 
 
-def download_existing_csv(resource: dict) -> pd.DataFrame:
-    """Download the CSV currently attached to the resource."""
+def download_existing_csv(resource: dict, path: str) -> bool:
+    """Download the CSV currently attached to the resource to path. False if there is none."""
     # CKAN sets the url field to the full download URL after a file upload
     download_url = resource.get('url', '')
 
     if not download_url:
         logger.warning("Resource has no URL — starting with empty dataset")
-        return pd.DataFrame()
+        return False
 
     logger.info(f"Downloading existing CSV from: {download_url}")
     try:
-        resp = scraper.get(download_url, headers=AUTH, timeout=60, allow_redirects=True)
-        logger.info(f"  HTTP {resp.status_code} | Content-Type: {resp.headers.get('Content-Type', 'unknown')}")
-        resp.raise_for_status()
-
-        content_type = resp.headers.get('Content-Type', '')
-        if 'text/html' in content_type:
-            logger.error(f"  Got HTML instead of CSV — download URL may be blocked or requires login")
-            logger.error(f"  Response preview: {resp.text[:300]}")
-            return pd.DataFrame()
-
-        df = pd.read_csv(io.StringIO(resp.text))
-        logger.info(f"  Downloaded {len(df)} existing rows, columns: {list(df.columns)}")
-        return df
+        # Stream the body straight to disk rather than holding it in memory
+        with scraper.get(download_url, headers=AUTH, timeout=60, allow_redirects=True, stream=True) as resp:
+            logger.info(f"  HTTP {resp.status_code} | Content-Type: {resp.headers.get('Content-Type', 'unknown')}")
+            resp.raise_for_status()
+
+            content_type = resp.headers.get('Content-Type', '')
+            if 'text/html' in content_type:
+                logger.error(f"  Got HTML instead of CSV — download URL may be blocked or requires login")
+                logger.error(f"  Response preview: {resp.text[:300]}")
+                return False
+
+            resp.raw.decode_content = True  # undo any gzip transfer encoding
+            with open(path, 'wb') as f:
+                shutil.copyfileobj(resp.raw, f, COPY_BUFFER)
+
+        logger.info(f"  Downloaded {os.path.getsize(path):,} bytes")
+        return True
     except Exception as e:
         logger.error(f"Failed to download existing CSV: {e}")
-        return pd.DataFrame()
+        return False
 
 
-def merge_data(existing: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
-    """Append new rows to existing — no deduplication, every run is a new snapshot."""
-    if existing.empty:
-        logger.info(f"No existing data — using all {len(new)} new rows")
-        return new.copy()
+def read_header(path: str) -> list[str]:
+    """Return the column names from the first line of a CSV file."""
+    with open(path, encoding='utf-8', newline='') as f:
+        return next(csv.reader(f), [])
 
-    combined = pd.concat([existing, new], ignore_index=True)
-    logger.info(f"Appended: {len(existing)} existing + {len(new)} new = {len(combined)} total rows")
-    return combined
 
+def count_rows(path: str) -> int:
+    """Count data rows in a CSV file (quoted newlines handled)."""
+    with open(path, encoding='utf-8', newline='') as f:
+        return max(sum(1 for _ in csv.reader(f)) - 1, 0)
 
-def update_resource_in_place(merged: pd.DataFrame) -> bool:
+
+def merge_csv_files(existing_path: str | None, new_path: str, output_path: str) -> None:
+    """Append new rows to existing — no deduplication, every run is a new snapshot."""
+    existing_header = read_header(existing_path) if existing_path else []
+    new_header = read_header(new_path)
+
+    if not existing_header:
+        logger.info("No existing data — using new rows only")
+        shutil.copyfile(new_path, output_path)
+        return
+
+    if existing_header == new_header:
+        # Same columns: concatenate bytes, existing file first, then the new body without its header
+        with open(output_path, 'wb') as out:
+            with open(existing_path, 'rb') as f:
+                shutil.copyfileobj(f, out, COPY_BUFFER)
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    out.write(b'\n')
+            with open(new_path, 'rb') as f:
+                f.readline()
+                shutil.copyfileobj(f, out, COPY_BUFFER)
+        return
+
+    # Columns differ: realign through pandas a chunk at a time, new columns appended at the end.
+    # Imported here so the usual same-header run never pays for loading pandas.
+    import pandas as pd
+
+    logger.info("Column layout changed — realigning columns while merging")
+    columns = existing_header + [c for c in new_header if c not in existing_header]
+    with open(output_path, 'w', encoding='utf-8', newline='') as out:
+        csv.writer(out).writerow(columns)
+        for path in (existing_path, new_path):
+            for chunk in pd.read_csv(path, chunksize=CHUNK_ROWS, dtype=str, keep_default_na=False):
+                chunk.reindex(columns=columns).to_csv(out, header=False, index=False)
+
+
+def update_resource_in_place(path: str) -> bool:
     """Replace the resource file via resource_update, keeping the same UUID."""
     timestamp = datetime.now(UTC).strftime('%Y-%m-%d %H:%M:%S UTC')
-    csv_bytes = merged.to_csv(index=False).encode('utf-8')
 
     url = f"{CKAN_URL}/api/3/action/resource_update"
     data = {
@@ -107,16 +152,17 @@ def update_resource_in_place(merged: pd.DataFrame) -> bool:
             f'Last updated: {timestamp}'
         ),
     }
-    files = {'upload': ('ckan-sites-timeseries.csv', csv_bytes, 'text/csv')}
 
     try:
-        resp = scraper.post(url, data=data, files=files, headers=AUTH, timeout=60)
+        # Stream the merged file from disk, so the upload body is never held in memory
+        with open(path, 'rb') as fh:
+            m = MultipartEncoder(fields={**data, 'upload': ('ckan-sites-timeseries.csv', fh, 'text/csv')})
+            resp = scraper.post(url, data=m, headers={**AUTH, 'Content-Type': m.content_type}, timeout=60)
         resp.raise_for_status()
         result = resp.json()
         if result.get('success'):
             confirmed_id = result['result']['id']
             logger.info(f"✓ Resource updated in-place — id unchanged: {confirmed_id}")
-            logger.info(f"  Rows: {len(merged)}")
             return True
         logger.error(f"resource_update failed: {result.get('error')}")
         return False
@@ -136,16 +182,17 @@ def main():
         logger.error("CKAN_API_KEY is not set")
         sys.exit(1)
 
-    # 1. Load new stats
+    # 1. Check new stats
     try:
-        new_df = pd.read_csv(NEW_STATS_FILE)
-        logger.info(f"Read {len(new_df)} rows from {NEW_STATS_FILE}")
+        new_header = read_header(NEW_STATS_FILE)
+        new_rows = count_rows(NEW_STATS_FILE)
+        logger.info(f"Read {new_rows} rows from {NEW_STATS_FILE}")
     except Exception as e:
         logger.error(f"Cannot read {NEW_STATS_FILE}: {e}")
         sys.exit(1)
 
     for col in UNIQUE_COLUMNS:
-        if col not in new_df.columns:
+        if col not in new_header:
             logger.error(f"Required column '{col}' missing from {NEW_STATS_FILE}")
             sys.exit(1)
 
@@ -155,19 +202,25 @@ def main():
         logger.error("Cannot proceed without a valid resource — check RESOURCE_ID")
         sys.exit(1)
 
-    # 3. Download existing CSV
-    existing_df = download_existing_csv(resource)
+    with tempfile.TemporaryDirectory() as tmp:
+        existing_path = os.path.join(tmp, 'existing.csv')
+        merged_path = os.path.join(tmp, 'merged.csv')
 
-    # 4. Merge
-    merged_df = merge_data(existing_df, new_df)
+        # 3. Download existing CSV
+        has_existing = download_existing_csv(resource, existing_path)
 
-    # 5. Upload merged CSV back in-place
-    if not update_resource_in_place(merged_df):
-        logger.error("In-place update failed")
-        sys.exit(1)
+        # 4. Merge on disk
+        # The merged file is not re-read just to count it; only the new rows are known cheaply
+        merge_csv_files(existing_path if has_existing else None, NEW_STATS_FILE, merged_path)
+        logger.info(f"Merged: {new_rows} new rows appended to {'existing data' if has_existing else 'an empty resource'}")
+
+        # 5. Upload merged CSV back in-place
+        if not update_resource_in_place(merged_path):
+            logger.error("In-place update failed")
+            sys.exit(1)
 
     print(f"\n✓ Done. Resource ID is unchanged: {RESOURCE_ID}")
-    print(f"  Total rows : {len(merged_df)}")
+    print(f"  Rows added : {new_rows}")
     print(f"  View at    : {CKAN_URL}/dataset/ckan-time-series-dataset-experimental/resource/{RESOURCE_ID}")
 
 
@@ -5,18 +5,43 @@ import sys
 import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-import cloudscraper
-import pandas as pd
+import argparse
+import csv
+import json
+import time
+import httpx
 import re
 from urllib.parse import urlparse
-from config import USER_AGENT, CKAN_BASE_URL, SESSION_HEADERS
+from concurrent.futures import ThreadPoolExecutor
+from config import USER_AGENT, CKAN_BASE_URL, SESSION_HEADERS, MAX_CONNECTIONS_PER_HOST
+
+PAGE_SIZE = 100
+MAX_WORKERS = MAX_CONNECTIONS_PER_HOST  # Concurrent package_search page requests, one connection each
+
+# Opt-in (--cache) on-disk snapshot of the whole site list, so local reruns don't
+# refetch everything. All pages are stored and expire together.
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'package_search')
+CACHE_FILE = os.path.join(CACHE_DIR, f"sites_{PAGE_SIZE}.json")
+CACHE_TTL = 3600  # seconds
+
+# Simple URL extraction from notes/description text
+URL_PATTERN = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+[^\s<>"{}|\\^`\[\].,;!?]', re.IGNORECASE)
+SITE_URL_KEYS = ('website', 'homepage', 'site_url', 'portal_url')  # Checked in this order
+SKIP_EXTS = ('.csv', '.json', '.xml', '.pdf', '.zip', '.xlsx')  # Obvious file downloads, not sites
 
 class SimpleSiteURLExtractor:
-    def __init__(self):
+    def __init__(self, use_cache=False):
         self.base_url = CKAN_BASE_URL
+        self.use_cache = use_cache
         self.api_base = f"{self.base_url}/api/3/action"
-        self.session = cloudscraper.create_scraper()
-        self.session.headers.update(SESSION_HEADERS)
+        # HTTP/2 multiplexes the concurrent page requests over one connection;
+        # httpx falls back to HTTP/1.1 on its own if the server doesn't offer h2
+        self.session = httpx.Client(
+            http2=True,
+            headers=SESSION_HEADERS,
+            limits=httpx.Limits(max_connections=MAX_WORKERS, max_keepalive_connections=MAX_WORKERS),
+            timeout=30.0
+        )
         
     def clean_url(self, url):
         """Clean and validate URL"""
@@ -57,75 +82,126 @@ class SimpleSiteURLExtractor:
                 cleaned = self.clean_url(resource_url)
                 if cleaned:
                     # Skip obvious file downloads
-                    if not any(ext in cleaned.lower() for ext in ['.csv', '.json', '.xml', '.pdf', '.zip', '.xlsx']):
+                    if not urlparse(cleaned).path.lower().endswith(SKIP_EXTS):
                         return cleaned
         
         # Check extras for website/homepage URLs
-        for extra in package.get('extras', []):
-            if extra.get('key', '').lower() in ['website', 'homepage', 'site_url', 'portal_url']:
-                extra_url = extra.get('value', '')
-                if extra_url:
-                    cleaned = self.clean_url(extra_url)
-                    if cleaned:
-                        return cleaned
+        extras = {e.get('key', '').lower(): e.get('value', '') for e in package.get('extras', [])}
+        for key in SITE_URL_KEYS:
+            extra_url = extras.get(key)
+            if extra_url:
+                cleaned = self.clean_url(extra_url)
+                if cleaned:
+                    return cleaned
         
-        # Look for URLs in notes/description
+        # Look for URLs in notes/description, only if there could be one
         notes = package.get('notes', '')
-        if notes:
-            # Simple URL extraction from text
-            url_pattern = r'https?://[^\s<>"{}|\\^`\[\]]+[^\s<>"{}|\\^`\[\].,;!?]'
-            urls = re.findall(url_pattern, notes, re.IGNORECASE)
+        if notes and '://' in notes:
+            urls = URL_PATTERN.findall(notes)
             for url in urls:
                 cleaned = self.clean_url(url)
-                if cleaned and not any(ext in cleaned.lower() for ext in ['.csv', '.json', '.xml', '.pdf', '.zip', '.xlsx']):
+                if cleaned and not urlparse(cleaned).path.lower().endswith(SKIP_EXTS):
                     return cleaned
         
         return ""
     
-    def get_all_sites(self):
-        """Get all sites with their visit URLs"""
-        print("Fetching all sites...")
+    def _read_snapshot(self, max_age=CACHE_TTL):
+        """Return the cached site list if it is younger than max_age seconds"""
+        try:
+            with open(CACHE_FILE, encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if time.time() - snapshot['fetched_at'] < max_age:
+                return snapshot
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return None
+    
+    def _write_snapshot(self, count, packages):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{CACHE_FILE}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'fetched_at': time.time(), 'count': count, 'results': packages}, f)
+        os.replace(tmp_path, CACHE_FILE)
+    
+    def fetch_page(self, start, rows=PAGE_SIZE):
+        """Fetch one page of site packages, returns the package_search result or None"""
+        response = self.session.get(
+            f"{self.api_base}/package_search",
+            params={
+                'q': 'type:site',
+                'start': start,
+                'rows': rows,
+                'sort': 'name asc',  # Stable order so concurrent pages don't overlap
+                'include_private': False
+            }
+        )
+        
+        if response.status_code != 200:
+            print(f"API failed with status {response.status_code} (start={start})")
+            return None
+        
+        data = response.json()
+        if not data.get('success'):
+            print(f"API returned error (start={start})")
+            return None
+        
+        return data['result']
+    
+    def fetch_all_packages(self):
+        """Fetch every site package, from the cached snapshot when --cache allows it"""
+        if self.use_cache:
+            snapshot = self._read_snapshot()
+            if snapshot is not None:
+                # Cheap rows=0 query: the snapshot is only reused while the count matches
+                current = self.fetch_page(0, rows=0)
+                if current and current.get('count') == snapshot['count']:
+                    print(f"Using cached snapshot of {snapshot['count']} sites")
+                    return snapshot['results']
+                print("Site count changed since the cached snapshot, fetching fresh")
         
+        all_packages, total_count, complete = self._fetch_all_pages()
+        if complete:
+            if self.use_cache:
+                self._write_snapshot(total_count, all_packages)
+        elif self.use_cache:
+            # Never mix pages from different fetches; use the last complete snapshot whole
+            stale = self._read_snapshot(max_age=float('inf'))
+            if stale is not None:
+                print("Some pages failed, using the last complete cached snapshot")
+                return stale['results']
+        return all_packages
+    
+    def _fetch_all_pages(self):
+        """Fetch all pages from the API; returns (packages, total_count, complete)"""
+        # The first page also gives the total count
         all_packages = []
-        start = 0
-        rows = 100
+        first_page = self.fetch_page(0)
+        if not first_page:
+            return all_packages, 0, False
+        total_count = first_page.get('count', 0)
+        all_packages.extend(first_page.get('results', []))
+        print(f"Fetched {len(all_packages)}/{total_count} sites")
+        complete = True
         
-        while True:
-            print(f"Fetching batch starting at {start}...")
-            
-            response = self.session.get(
-                f"{self.api_base}/package_search",
-                params={
-                    'q': 'type:site',
-                    'start': start,
-                    'rows': rows,
-                    'include_private': False
-                }
-            )
-            
-            if response.status_code != 200:
-                print(f"API failed with status {response.status_code}")
-                break
-            
-            data = response.json()
-            if not data.get('success'):
-                print("API returned error")
-                break
-            
-            result = data['result']
-            batch_packages = result.get('results', [])
-            total_count = result.get('count', 0)
-            
-            all_packages.extend(batch_packages)
-            
+        # Remaining pages are independent, so fetch them concurrently
+        starts = list(range(PAGE_SIZE, total_count, PAGE_SIZE))
+        if starts:
+            print(f"Fetching {len(starts)} more batches with {MAX_WORKERS} workers...")
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                for page in executor.map(self.fetch_page, starts):
+                    if page:
+                        all_packages.extend(page.get('results', []))
+                    else:
+                        complete = False
             print(f"Fetched {len(all_packages)}/{total_count} sites")
-
-            
-            # Stop if we got fewer results than requested or reached the total
-            if len(batch_packages) < rows or len(all_packages) >= total_count:
-                break
-                
-            start += rows
+        
+        return all_packages, total_count, complete
+    
+    def get_all_sites(self):
+        """Get all sites with their visit URLs"""
+        print("Fetching all sites...")
+        
+        all_packages = self.fetch_all_packages()
         
         print(f"Total sites found: {len(all_packages)}")
         
@@ -155,8 +231,10 @@ class SimpleSiteURLExtractor:
         # Filter out empty URLs
         filtered_results = [r for r in results if r['url']]
         
-        df = pd.DataFrame(filtered_results)
-        df.to_csv(filename, index=False, encoding='utf-8')
+        with open(filename, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=['name', 'url'])
+            writer.writeheader()
+            writer.writerows(filtered_results)
         
         # Print summary
         total = len(results)
@@ -172,14 +250,24 @@ class SimpleSiteURLExtractor:
         for i, result in enumerate(filtered_results[:5], 1):
             print(f"  {i}. {result['name']}: {result['url']}")
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='Simple CKAN Site URL Extractor')
+    parser.add_argument('--cache', action='store_true',
+                        help='Reuse the site list cached by an earlier run if it is under an hour '
+                             'old and the site count is unchanged')
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    
     print("Simple CKAN Site URL Extractor")
     print("=" * 40)
     
     output_file = "site_urls.csv"
     
-    extractor = SimpleSiteURLExtractor()
-    results = extractor.get_all_sites()
+    extractor = SimpleSiteURLExtractor(use_cache=args.cache)
+    with extractor.session:
+        results = extractor.get_all_sites()
     
     if results:
         extractor.save_to_csv(results, output_file)
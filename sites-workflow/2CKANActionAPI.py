@@ -4,15 +4,19 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import ssl
 import csv
+import threading
 import cloudscraper
+import httpx
 import json
+import orjson
 import requests.adapters
 from pathlib import Path
-from urllib.parse import urljoin
+from itertools import zip_longest
+from urllib.parse import urljoin, urlparse
 from datetime import datetime, UTC
 import urllib3
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Dict, List
+from typing import Dict
 import logging
 from config import USER_AGENT, SESSION_HEADERS
 
@@ -35,8 +39,11 @@ class SSLIgnoreAdapter(requests.adapters.HTTPAdapter):
 INPUT_CSV_FILE = "site_urls.csv"
 OUTPUT_CSV_FILE = "ckan_stats.csv"
 MAX_WORKERS = 10  # Number of concurrent threads
+SITES_PER_HOST = 2  # Sites fetched at once from the same host (each fires several endpoint calls)
 REQUEST_TIMEOUT = 20  # Timeout per request (GitHub Actions has good bandwidth but some sites are slow)
 RETRY_ATTEMPTS = 2  # Number of retries for transient failures (common from cloud IPs)
+# CKAN_FETCH_STATUS=false gives a count-only scan (skips status_show: version/extensions)
+FETCH_STATUS = os.getenv('CKAN_FETCH_STATUS', 'true').lower() != 'false'
 
 # Setup logging
 logging.basicConfig(
@@ -45,22 +52,56 @@ logging.basicConfig(
     datefmt='%H:%M:%S'
 )
 logger = logging.getLogger(__name__)
+# httpx/h2 internals are very chatty at DEBUG
+for name in ('httpx', 'httpcore', 'hpack', 'h2'):
+    logging.getLogger(name).setLevel(logging.WARNING)
 
 
 class SimpleCKANExtractor:
     def __init__(self):
+        # Every row of a run shares one logical snapshot date
+        self._tstamp = datetime.now(UTC).strftime('%Y-%m-%d')
+        # Most CKAN portals aren't behind Cloudflare: talk to them over plain HTTP/2, which
+        # multiplexes a site's endpoint calls, and keep cloudscraper for hosts that challenge us
+        self.client = httpx.Client(
+            http2=True,
+            verify=False,
+            follow_redirects=True,
+            timeout=REQUEST_TIMEOUT,
+            headers=SESSION_HEADERS,
+            limits=httpx.Limits(max_connections=MAX_WORKERS * 8, max_keepalive_connections=MAX_WORKERS * 4)
+        )
         self.session = self._create_session()
+        self._cf_hosts = set()
+        self._host_slots = {}
+        self._host_slots_lock = threading.Lock()
 
     def _create_session(self) -> cloudscraper.CloudScraper:
         """Create a cloudscraper session to bypass Cloudflare"""
         session = cloudscraper.create_scraper()
         session.headers.update(SESSION_HEADERS)
-        adapter = SSLIgnoreAdapter()
+        # One pool per site in flight (x2 for the http fallback), each wide enough
+        # for that site's concurrent endpoint calls
+        adapter = SSLIgnoreAdapter(pool_connections=MAX_WORKERS * 2, pool_maxsize=8)
         session.mount('https://', adapter)
         session.mount('http://', adapter)
 
         return session
     
+    def _get(self, api_url: str, params: Dict = None):
+        """GET via httpx, switching a host over to cloudscraper once Cloudflare challenges it"""
+        host = urlparse(api_url).netloc
+        if host not in self._cf_hosts:
+            response = self.client.get(api_url, params=params)
+            challenged = response.status_code in (403, 503) and (
+                'cf-ray' in response.headers or response.headers.get('server', '').lower() == 'cloudflare'
+            )
+            if not challenged:
+                return response
+            logger.debug(f"Cloudflare challenge from {host}, using cloudscraper for it from now on")
+            self._cf_hosts.add(host)
+        return self.session.get(api_url, timeout=REQUEST_TIMEOUT, params=params)
+    
     def normalize_url(self, url: str) -> str:
         """Normalize URL format"""
         url = url.strip()
@@ -81,9 +122,9 @@ class SimpleCKANExtractor:
             api_url = urljoin(url + '/', f'api/3/action/{endpoint}')
             for attempt in range(1, RETRY_ATTEMPTS + 2):  # +2: initial try + RETRY_ATTEMPTS retries
                 try:
-                    response = self.session.get(api_url, timeout=REQUEST_TIMEOUT, params=params)
+                    response = self._get(api_url, params=params)
                     response.raise_for_status()
-                    data = response.json()
+                    data = orjson.loads(response.content)
                     if data.get('success', False):
                         return data
                     logger.debug(f"API success=false for {api_url}: {data.get('error')}")
@@ -102,68 +143,95 @@ class SimpleCKANExtractor:
 
         stats = self.get_empty_stats()
 
-        # Get number of datasets using package_search?rows=0 (returns count without
-        # downloading all IDs — package_list times out on large sites with 10k+ datasets)
-        package_data = self.make_api_call(normalized_url, 'package_search', params={'rows': 0})
+        # The count endpoints are independent, so call them concurrently.
+        # package_search?rows=0 returns the dataset count without downloading all IDs
+        # (package_list times out on large sites with 10k+ datasets)
+        calls = {
+            'package_search': {'rows': 0},
+            'group_list': None,
+            'organization_list': None,
+        }
+        with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+            futures = {
+                endpoint: executor.submit(self.make_api_call, normalized_url, endpoint, params)
+                for endpoint, params in calls.items()
+            }
+        package_data, group_data, org_data = (futures[e].result() for e in calls)
+
+        # Only ask for status_show if the site answered as CKAN at all; dead or
+        # non-CKAN sites would just burn another round of retries
+        status_data = None
+        if FETCH_STATUS and (package_data or group_data or org_data):
+            status_data = self.make_api_call(normalized_url, 'status_show')
+
+        # Get number of datasets
         if package_data and isinstance(package_data.get('result'), dict):
-            stats['num_datasets'] = str(package_data['result'].get('count', 0))
+            stats['num_datasets'] = int(package_data['result'].get('count', 0))
 
         # Get number of groups
-        group_data = self.make_api_call(normalized_url, 'group_list')
         if group_data and isinstance(group_data.get('result'), list):
-            stats['num_groups'] = str(len(group_data['result']))
+            stats['num_groups'] = len(group_data['result'])
 
         # Get number of organizations
-        org_data = self.make_api_call(normalized_url, 'organization_list')
         if org_data and isinstance(org_data.get('result'), list):
-            stats['num_organizations'] = str(len(org_data['result']))
+            stats['num_organizations'] = len(org_data['result'])
         
         # Get CKAN version and extensions
-        status_data = self.make_api_call(normalized_url, 'status_show')
         if status_data and isinstance(status_data.get('result'), dict):
             result = status_data['result']
             stats['ckan_version'] = result.get('ckan_version', '')
             extensions = result.get('extensions', [])
             if extensions:
-                stats['extensions'] = json.dumps(extensions)
-        
-        stats['tstamp'] = datetime.now(UTC).strftime('%Y-%m-%d')
+                # Compact JSON: smaller CSV, still json.loads-compatible with earlier rows in the datastore
+                stats['extensions'] = json.dumps(extensions, separators=(',', ':'))
         
         return stats
     
     def get_empty_stats(self) -> Dict:
         """Return empty stats structure"""
         return {
-            'num_datasets': '0',
-            'num_groups': '0',
-            'num_organizations': '0',
+            'num_datasets': 0,
+            'num_groups': 0,
+            'num_organizations': 0,
             'ckan_version': '',
             'extensions': '',
-            'tstamp': datetime.now(UTC).strftime('%Y-%m-%d')
+            'tstamp': self._tstamp
         }
     
-    def process_single_row(self, row: Dict, index: int, total: int) -> Dict:
-        """Process a single row"""
-        url = row.get('url', '').strip()
-        processed_row = row.copy()
-        
-        if url:
-            try:
-                stats = self.get_ckan_stats(url)
-                processed_row.update(stats)
-                logger.info(
-                    f"[{index}/{total}] {url[:50]:50s} | "
-                    f"D:{stats['num_datasets']:>4s} G:{stats['num_groups']:>3s} "
-                    f"O:{stats['num_organizations']:>3s} V:{stats['ckan_version']}"
-                )
-            except Exception as e:
-                logger.error(f"[{index}/{total}] Failed: {url} - {str(e)}")
-                processed_row.update(self.get_empty_stats())
-        else:
+    def _site_key(self, url: str) -> str:
+        """Dedup key for a site: normalized url with only scheme and host lowercased"""
+        parsed = urlparse(self.normalize_url(url))
+        return parsed._replace(scheme=parsed.scheme.lower(), netloc=parsed.netloc.lower()).geturl()
+    
+    def _host_slot(self, url: str) -> threading.BoundedSemaphore:
+        """Semaphore limiting how many sites on this url's host are fetched at once"""
+        host = urlparse(self.normalize_url(url)).netloc.lower()
+        with self._host_slots_lock:
+            return self._host_slots.setdefault(host, threading.BoundedSemaphore(SITES_PER_HOST))
+    
+    def get_site_stats(self, url: str, index: int, total: int) -> Dict:
+        """Fetch stats for a single site, falling back to empty stats on failure"""
+        if not url:
             logger.warning(f"[{index}/{total}] Empty URL, skipping")
-            processed_row.update(self.get_empty_stats())
+            return self.get_empty_stats()
         
-        return processed_row
+        try:
+            with self._host_slot(url):
+                stats = self.get_ckan_stats(url)
+            logger.info(
+                f"[{index}/{total}] {url[:50]:50s} | "
+                f"D:{stats['num_datasets']:>4d} G:{stats['num_groups']:>3d} "
+                f"O:{stats['num_organizations']:>3d} V:{stats['ckan_version']}"
+            )
+            return stats
+        except Exception as e:
+            logger.error(f"[{index}/{total}] Failed: {url} - {str(e)}")
+            return self.get_empty_stats()
+    
+    def process_single_row(self, row: Dict, stats: Dict) -> Dict:
+        """Merge a site's stats into its input row (in place; process_csv owns the rows)"""
+        row.update(stats)
+        return row
     
     def process_csv(self, input_file: str, output_file: str):
         """Process CSV file with concurrent execution"""
@@ -191,61 +259,87 @@ class SimpleCKANExtractor:
             'extensions'
         ]
         
-        # Create final fieldnames
-        final_fieldnames = ['tstamp']
-        for col in original_fieldnames:
-            if col != 'tstamp' and col not in final_fieldnames:
-                final_fieldnames.append(col)
-        for col in stats_columns:
-            if col != 'tstamp' and col not in final_fieldnames:
-                final_fieldnames.append(col)
+        # Create final fieldnames: tstamp first, then input columns, then new stats columns
+        # (dict keys act as an ordered set)
+        final_fieldnames = list(dict.fromkeys(['tstamp', *original_fieldnames, *stats_columns]))
         
-        logger.info(f"Processing {len(rows)} rows with {MAX_WORKERS} workers...")
+        # Rows pointing at the same site (once normalized) share a single fetch
+        sites = {}
+        for i, row in enumerate(rows):
+            url = row.get('url', '').strip()
+            sites.setdefault(self._site_key(url), (url, []))[1].append(i)
         
-        # Process rows concurrently
-        processed_rows = [None] * len(rows)  # Pre-allocate to maintain order
+        # Interleave hosts in submission order, so workers rarely sit waiting on a busy host's slots
+        by_host = {}
+        for key, site in sites.items():
+            by_host.setdefault(urlparse(key).netloc, []).append(site)
+        queue = [site for batch in zip_longest(*by_host.values()) for site in batch if site]
         
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            # Submit all tasks
-            future_to_index = {
-                executor.submit(self.process_single_row, row, i + 1, len(rows)): i
-                for i, row in enumerate(rows)
+        logger.info(f"Processing {len(rows)} rows ({len(sites)} unique sites on {len(by_host)} hosts) "
+                    f"with {MAX_WORKERS} workers...")
+        
+        totals = {'rows': 0, 'num_datasets': 0, 'num_groups': 0, 'num_organizations': 0, 'sites_with_data': 0}
+        
+        # Process rows concurrently and write each one as soon as every row before it is done,
+        # so output keeps input order while only out-of-order completions are held in memory
+        with open(output_file, 'w', encoding='utf-8', newline='') as f, \
+                ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            writer = csv.DictWriter(f, fieldnames=final_fieldnames)
+            writer.writeheader()
+            
+            # Submit one task per unique site
+            future_to_indices = {
+                executor.submit(self.get_site_stats, url, n, len(sites)): indices
+                for n, (url, indices) in enumerate(queue, 1)
             }
             
-            # Collect results as they complete
-            for future in as_completed(future_to_index):
-                index = future_to_index[future]
+            # Collect results as they complete and hand them to every row for that site
+            ready = {}
+            next_index = 0
+            for future in as_completed(future_to_indices):
+                indices = future_to_indices[future]
                 try:
-                    processed_rows[index] = future.result()
+                    stats = future.result()
                 except Exception as e:
-                    logger.error(f"Task failed for row {index + 1}: {str(e)}")
+                    logger.error(f"Task failed for row {indices[0] + 1}: {str(e)}")
                     # Add empty stats for failed rows
-                    processed_rows[index] = rows[index].copy()
-                    processed_rows[index].update(self.get_empty_stats())
-        
-        # Write output file
-        with open(output_file, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=final_fieldnames)
-            writer.writeheader()
-            writer.writerows(processed_rows)
+                    stats = self.get_empty_stats()
+                for index in indices:
+                    ready[index] = self.process_single_row(rows[index], stats)
+                
+                while next_index in ready:
+                    processed_row = ready.pop(next_index)
+                    writer.writerow(processed_row)
+                    self._add_to_totals(totals, processed_row)
+                    rows[next_index] = None  # written, let it go
+                    next_index += 1
         
-        # Calculate and display summary
-        self._print_summary(input_file, output_file, processed_rows)
+        # Display summary
+        self._print_summary(input_file, output_file, totals)
+    
+    def _add_to_totals(self, totals: Dict, row: Dict):
+        """Fold one processed row into the running summary totals (counts are already ints)"""
+        num_datasets = row['num_datasets']
+        totals['rows'] += 1
+        totals['num_datasets'] += num_datasets
+        totals['num_groups'] += row['num_groups']
+        totals['num_organizations'] += row['num_organizations']
+        totals['sites_with_data'] += num_datasets > 0
     
-    def _print_summary(self, input_file: str, output_file: str, processed_rows: List[Dict]):
+    def _print_summary(self, input_file: str, output_file: str, totals: Dict):
         """Print processing summary"""
-        total_datasets = sum(int(row.get('num_datasets', 0)) for row in processed_rows)
-        total_groups = sum(int(row.get('num_groups', 0)) for row in processed_rows)
-        total_orgs = sum(int(row.get('num_organizations', 0)) for row in processed_rows)
+        total_datasets = totals['num_datasets']
+        total_groups = totals['num_groups']
+        total_orgs = totals['num_organizations']
         
-        sites_with_data = sum(1 for row in processed_rows if int(row.get('num_datasets', 0)) > 0)
+        sites_with_data = totals['sites_with_data']
         
         logger.info("\n" + "=" * 70)
         logger.info("PROCESSING COMPLETE")
         logger.info("=" * 70)
         logger.info(f"Input file:  {input_file}")
         logger.info(f"Output file: {output_file}")
-        logger.info(f"Total rows:  {len(processed_rows)}")
+        logger.info(f"Total rows:  {totals['rows']}")
         logger.info(f"Sites with data: {sites_with_data}")
         logger.info(f"\nTotal datasets:      {total_datasets:,}")
         logger.info(f"Total groups:        {total_groups:,}")
@@ -7,16 +7,32 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import pandas as pd
 import cloudscraper
-import json
+from urllib3.util.retry import Retry
+import orjson
 from datetime import datetime
 import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tqdm import tqdm
 from typing import Dict, Optional, List
-from config import USER_AGENT, CKAN_BASE_URL, SESSION_HEADERS
+from config import USER_AGENT, CKAN_BASE_URL, SESSION_HEADERS, MAX_CONNECTIONS_PER_HOST
 
 # Configuration
 CKAN_API_BASE = f"{CKAN_BASE_URL}/api/3/action"
 CKAN_API_KEY = os.getenv('CKAN_API_KEY', 'CKAN_API_KEY')
+MAX_WORKERS = MAX_CONNECTIONS_PER_HOST  # Concurrent package_patch calls against the catalog
+MAX_RETRIES = 4  # Retries when the catalog answers 429 or a transient 5xx
+
+# Only these columns of ckan_stats.csv are used; everything else is skipped at parse time.
+# Counts are read as text so one bad cell is coerced to 0 below instead of failing the load
+STATS_DTYPES = {
+    'name': 'string',
+    'url': 'string',
+    'num_datasets': 'object',
+    'num_groups': 'object',
+    'num_organizations': 'object',
+}
+STATS_COUNT_COLUMNS = ('num_datasets', 'num_groups', 'num_organizations')
 
 class CKANSiteStatsUpdater:
     def __init__(self, api_key: str, base_url: str = CKAN_BASE_URL):
@@ -30,30 +46,27 @@ class CKANSiteStatsUpdater:
             'Authorization': api_key,
             'Content-Type': 'application/json',
         })
+        # Size the pool for the update workers and retry transient 5xx at the
+        # transport level; 429 keeps its own backoff in update_package_stats and
+        # 503 is left to cloudscraper, which uses it for Cloudflare challenges.
+        # Reuse cloudscraper's TLS context so its cipher suite is kept.
+        retry = Retry(
+            total=MAX_RETRIES,
+            backoff_factor=0.5,
+            status_forcelist=[500, 502, 504],
+            allowed_methods=['GET', 'POST'],
+            raise_on_status=False
+        )
+        self.session.mount('https://', cloudscraper.CipherSuiteAdapter(
+            ssl_context=self.session.get_adapter('https://').ssl_context,
+            pool_connections=MAX_WORKERS,
+            pool_maxsize=MAX_WORKERS,
+            max_retries=retry
+        ))
         self.processed_count = 0
         self.error_count = 0
         self.start_time = datetime.now()
-
-    def print_status(self, current: int, total: int, package_name: str = ""):
-        """Print processing status with ETA"""
-        if current == 0:
-            self.start_time = datetime.now()
-            print(f"Starting to process {total} packages...")
-            return
-            
-        elapsed = (datetime.now() - self.start_time).total_seconds()
-        rate = elapsed / current if current > 0 else 0
-        remaining = rate * (total - current)
-        
-        hours, remainder = divmod(int(remaining), 3600)
-        minutes, seconds = divmod(remainder, 60)
-        eta = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-        
-        elapsed_formatted = f"{int(elapsed//3600):02d}:{int((elapsed%3600)//60):02d}:{int(elapsed%60):02d}"
-        
-        print(f"Processing {current}/{total} | {package_name} | " +
-              f"Elapsed: {elapsed_formatted} | ETA: {eta} | " +
-              f"Success: {self.processed_count} | Errors: {self.error_count}")
+        self._connection_ok = False
 
     def get_package_info(self, package_name: str) -> Optional[Dict]:
         """Get current package information from CKAN"""
@@ -80,106 +93,102 @@ class CKANSiteStatsUpdater:
 
     def prepare_stats_update(self, stats: Dict) -> Dict:
         """Prepare statistics for CKAN update using proper schema fields"""
-        
-        # Map statistics fields to CKAN schema fields
-        field_mapping = {
-            'num_datasets': 'num_datasets',
-            'num_groups': 'num_groups', 
-            'num_organizations': 'num_organizations'
-        }
-        
-        # Convert stats to CKAN format
-        update_data = {}
-        for original_key, ckan_field in field_mapping.items():
-            if original_key in stats and stats[original_key] is not None:
-                value = stats[original_key]
-                
-                # Handle integer fields
-                try:
-                    value = int(value) if value is not None and not pd.isna(value) else 0
-                except (ValueError, TypeError):
-                    value = 0
-                
-                # Only add non-negative values
-                if value >= 0:
-                    update_data[ckan_field] = value
-        
-        return update_data
+        # load_stats_data already filled, clipped and cast the counts
+        return {field: stats[field] for field in STATS_COUNT_COLUMNS if field in stats}
 
-    def update_package_stats(self, package_name: str, stats: Dict) -> bool:
-        """Update a single package with statistics"""
+    def update_package_stats(self, package_name: str, stats: Dict, log: List[str]) -> bool:
+        """Update a single package with statistics, appending any errors to log"""
         try:
-            print(f"Updating package: {package_name}")
-            
-            # Get current package info
-            current_package = self.get_package_info(package_name)
-            if not current_package:
-                print(f"Could not retrieve package info for {package_name}")
-                return False
-            
             # Prepare stats update using schema fields
             update_data = self.prepare_stats_update(stats)
             
             if not update_data:
-                print(f"No valid statistics to update for {package_name}")
+                log.append(f"No valid statistics to update for {package_name}")
                 return False
             
             # Add package ID to update data
             update_data['id'] = package_name
             
-            print(f"Updating stats: datasets={update_data.get('num_datasets', 0)}, " +
-                  f"groups={update_data.get('num_groups', 0)}, " +
-                  f"orgs={update_data.get('num_organizations', 0)}")
-            
-            # Make the patch request
-            response = self.session.post(
-                f"{self.api_base}/package_patch",
-                data=json.dumps(update_data)
-            )
+            # Patch directly; a missing package comes back as a Not Found Error
+            for attempt in range(MAX_RETRIES + 1):
+                response = self.session.post(
+                    f"{self.api_base}/package_patch",
+                    data=orjson.dumps(update_data)
+                )
+                if response.status_code != 429 or attempt == MAX_RETRIES:
+                    break
+                # Rate limited: back off exponentially, or as long as the server asks
+                retry_after = response.headers.get('Retry-After', '')
+                delay = float(retry_after) if retry_after.isdigit() else 2 ** attempt
+                time.sleep(delay)
             
             if response.status_code == 200:
                 data = response.json()
                 if data.get('success'):
-                    print(f"Successfully updated {package_name}")
                     return True
                 else:
-                    print(f"API error updating {package_name}: {data.get('error', {})}")
+                    log.append(f"API error updating {package_name}: {data.get('error', {})}")
                     return False
+            elif response.status_code == 404:
+                try:
+                    error = response.json().get('error', {})
+                except ValueError:
+                    error = {}
+                if error.get('__type') == 'Not Found Error':
+                    log.append(f"Package {package_name} not found, skipping")
+                else:
+                    log.append(f"HTTP error 404 updating {package_name}: {response.text}")
+                return False
             else:
-                print(f"HTTP error {response.status_code} updating {package_name}: {response.text}")
+                log.append(f"HTTP error {response.status_code} updating {package_name}: {response.text}")
                 return False
                 
         except Exception as e:
-            print(f"Error updating package {package_name}: {str(e)}")
-            traceback.print_exc()
+            log.append(f"Error updating package {package_name}: {str(e)}")
+            log.append(traceback.format_exc().rstrip())
             return False
 
     def load_stats_data(self, stats_file: str) -> List[Dict]:
         """Load statistics data from CSV"""
         try:
             print(f"Loading statistics from {stats_file}...")
-            stats_df = pd.read_csv(stats_file)
+            stats_df = pd.read_csv(
+                stats_file,
+                usecols=lambda col: col in STATS_DTYPES,
+                dtype=STATS_DTYPES
+            )
             
             # Check required columns
-            required_columns = ['name', 'num_datasets', 'num_groups', 'num_organizations']
+            required_columns = ['name', *STATS_COUNT_COLUMNS]
             missing_columns = [col for col in required_columns if col not in stats_df.columns]
             if missing_columns:
                 print(f"Error: Missing required columns: {missing_columns}")
                 return []
             
-            # Convert to list of dictionaries
-            stats_data = []
-            for _, row in stats_df.iterrows():
-                if pd.notna(row['name']):  # Only process rows with valid names
-                    stats_data.append({
-                        'package_name': row['name'],
-                        'url': row.get('url', ''),
-                        'stats': {
-                            'num_datasets': row.get('num_datasets', 0),
-                            'num_groups': row.get('num_groups', 0),
-                            'num_organizations': row.get('num_organizations', 0)
-                        }
-                    })
+            # Only process rows with valid names; let pandas fill the gaps, coerce the
+            # counts to non-negative ints (unparseable values become 0) and build the records instead of walking
+            # rows with iterrows()
+            count_columns = list(STATS_COUNT_COLUMNS)
+            stats_df = (
+                stats_df.dropna(subset=['name'])
+                .reindex(columns=list(STATS_DTYPES))
+                .fillna({'url': ''})
+            )
+            stats_df[count_columns] = (
+                stats_df[count_columns]
+                .apply(pd.to_numeric, errors='coerce')
+                .fillna(0)
+                .clip(lower=0)
+                .astype('int64')
+            )
+            stats_data = [
+                {
+                    'package_name': record['name'],
+                    'url': record['url'],
+                    'stats': {col: record[col] for col in count_columns}
+                }
+                for record in stats_df.to_dict(orient='records')
+            ]
             
             print(f"Successfully loaded statistics for {len(stats_data)} packages")
             return stats_data
@@ -199,20 +208,35 @@ class CKANSiteStatsUpdater:
             return
         
         total_count = len(stats_data)
-        print(f"\nStarting to update {total_count} packages...")
+        print(f"\nStarting to update {total_count} packages with {MAX_WORKERS} workers...")
         print("=" * 60)
         
         success_list = []
         error_list = []
         
-        for idx, item in enumerate(stats_data, 1):
-            package_name = item['package_name']
-            stats = item['stats']
-            
-            self.print_status(idx, total_count, package_name)
+        # Patches are independent network round-trips, so overlap them; the pool size
+        # caps load on the catalog and update_package_stats backs off on 429.
+        # Workers only collect their error messages; each package's block is written
+        # here through tqdm in one go so it neither interleaves nor breaks the bar.
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            future_to_item = {}
+            for item in stats_data:
+                log = []
+                future = executor.submit(self.update_package_stats, item['package_name'], item['stats'], log)
+                future_to_item[future] = (item['package_name'], log)
             
-            try:
-                success = self.update_package_stats(package_name, stats)
+            progress_bar = tqdm(as_completed(future_to_item), total=total_count, desc="Updating packages")
+            for future in progress_bar:
+                package_name, log = future_to_item[future]
+                
+                try:
+                    success = future.result()
+                except Exception as e:
+                    log.append(f"Unexpected error processing {package_name}: {str(e)}")
+                    success = False
+                
+                if log:
+                    tqdm.write("\n".join(log))
                 
                 if success:
                     self.processed_count += 1
@@ -221,14 +245,7 @@ class CKANSiteStatsUpdater:
                     self.error_count += 1
                     error_list.append(package_name)
                 
-                # Brief pause between requests to be respectful to the API
-                time.sleep(0.5)
-                
-            except Exception as e:
-                print(f"Unexpected error processing {package_name}: {str(e)}")
-                self.error_count += 1
-                error_list.append(package_name)
-                continue
+                progress_bar.set_postfix(success=self.processed_count, errors=self.error_count, refresh=False)
         
         # Print final summary
         print("\n" + "=" * 60)
@@ -253,6 +270,13 @@ class CKANSiteStatsUpdater:
 
     def test_api_connection(self) -> bool:
         """Test CKAN API connection and authentication"""
+        # A passing check is remembered for this run only, never on disk
+        if not self._connection_ok:
+            self._connection_ok = self._check_api_connection()
+        return self._connection_ok
+
+    def _check_api_connection(self) -> bool:
+        """Call site_read and user_show against the CKAN API"""
         try:
             print("Testing CKAN API connection...")
             
@@ -19,14 +19,19 @@ import time
 import logging
 import cloudscraper
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, UTC
-from config import CKAN_BASE_URL, SESSION_HEADERS
-
-logging.basicConfig(
-    filename='datapump.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+from config import CKAN_BASE_URL, SESSION_HEADERS, MAX_CONNECTIONS_PER_HOST
+
+# One logger feeds both the log file and the console (level via LOG_LEVEL)
+file_handler = logging.FileHandler('datapump.log')
+file_handler.setLevel(logging.INFO)
+file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+console = logging.StreamHandler(sys.stdout)
+console.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+console.setFormatter(logging.Formatter('%(message)s'))
+# Root passes the lower of the two levels; each handler filters its own
+logging.basicConfig(level=min(file_handler.level, console.level), handlers=[file_handler, console])
 logger = logging.getLogger(__name__)
 
 CKAN_URL = CKAN_BASE_URL
@@ -34,6 +39,7 @@ API_KEY = os.getenv('CKAN_API_KEY', 'CKAN_API_KEY')
 DATASET_ID = 'ckan-sites-metadata'
 RESOURCE_NAME = 'CKAN Sites Dynamic Metadata'
 CSV_FILE_PATH = 'ckan_stats.csv'
+MAX_DELETE_WORKERS = MAX_CONNECTIONS_PER_HOST  # Concurrent resource_view_delete calls
 
 scraper = cloudscraper.create_scraper()
 scraper.headers.update(SESSION_HEADERS)
@@ -52,12 +58,9 @@ def find_resource() -> dict | None:
             return None
         for resource in result['result'].get('resources', []):
             if resource.get('name', '').startswith(RESOURCE_NAME):
-                print(f"✓ Found resource: {resource['name']}")
-                print(f"  Resource ID: {resource['id']}")
-                logger.info(f"Found resource '{resource['name']}' — id: {resource['id']}")
+                logger.info(f"✓ Found resource '{resource['name']}' — id: {resource['id']}")
                 return resource
-        print(f"✗ No resource found matching '{RESOURCE_NAME}'")
-        logger.info(f"No resource named '{RESOURCE_NAME}' in dataset — will create fresh")
+        logger.info(f"✗ No resource named '{RESOURCE_NAME}' in dataset — will create fresh")
         return None
     except Exception as e:
         logger.error(f"Error looking up resource in dataset: {e}")
@@ -71,8 +74,7 @@ def download_existing_datastore(resource_id: str) -> pd.DataFrame:
     offset = 0
     batch_size = 1000
 
-    print(f"  Downloading existing data to check for duplicates...")
-    logger.info(f"Downloading existing datastore records from {resource_id}...")
+    logger.info(f"  Downloading existing datastore records from {resource_id}...")
     try:
         while True:
             params = {'resource_id': resource_id, 'limit': batch_size, 'offset': offset}
@@ -92,8 +94,7 @@ def download_existing_datastore(resource_id: str) -> pd.DataFrame:
             offset += batch_size
             if len(all_records) >= total:
                 break
-        print(f"  Downloaded {len(all_records)} existing records")
-        logger.info(f"Downloaded {len(all_records)} existing records")
+        logger.info(f"  Downloaded {len(all_records)} existing records")
     except Exception as e:
         logger.error(f"Error downloading datastore records: {e}")
 
@@ -114,17 +115,25 @@ def get_resource_views(resource_id: str) -> list:
         return []
 
 
-def delete_resource_views(resource_id: str) -> None:
+def delete_resource_views(resource_id: str) -> dict:
+    """Delete all views of a resource concurrently. Returns {view_id: deleted}."""
     views = get_resource_views(resource_id)
     if not views:
-        return
+        return {}
     url = f"{CKAN_URL}/api/3/action/resource_view_delete"
-    for view in views:
+
+    def delete_view(view_id: str) -> bool:
         try:
-            resp = scraper.post(url, json={'id': view['id']}, headers=AUTH, timeout=30)
+            resp = scraper.post(url, json={'id': view_id}, headers=AUTH, timeout=30)
             resp.raise_for_status()
+            return True
         except Exception as e:
-            logger.error(f"Error deleting view {view['id']}: {e}")
+            logger.error(f"Error deleting view {view_id}: {e}")
+            return False
+
+    view_ids = [view['id'] for view in views]
+    with ThreadPoolExecutor(max_workers=min(MAX_DELETE_WORKERS, len(view_ids))) as executor:
+        return dict(zip(view_ids, executor.map(delete_view, view_ids)))
 
 
 def delete_resource(resource_id: str) -> bool:
@@ -161,8 +170,7 @@ def create_resource() -> str | None:
         result = resp.json()
         if result.get('success'):
             new_id = result['result']['id']
-            print(f"✓ Created new resource — id: {new_id}")
-            logger.info(f"Created new resource {new_id}")
+            logger.info(f"✓ Created new resource — id: {new_id}")
             return new_id
         logger.error(f"resource_create failed: {result.get('error')}")
         return None
@@ -182,7 +190,6 @@ def push_to_datastore(resource_id: str, df: pd.DataFrame) -> bool:
                 cleaned_r[k] = v.item() if hasattr(v, 'item') else v
         cleaned.append(cleaned_r)
 
-    print(f"\nInserting {len(cleaned)} records...")
     logger.info(f"Pushing {len(cleaned)} records to datastore...")
     url = f"{CKAN_URL}/api/3/action/datastore_create"
     data = {
@@ -198,8 +205,7 @@ def push_to_datastore(resource_id: str, df: pd.DataFrame) -> bool:
             resp.raise_for_status()
         result = resp.json()
         if result.get('success'):
-            print(f"✓ Successfully inserted {len(cleaned)} records")
-            logger.info(f"Inserted {len(cleaned)} records to resource {resource_id}")
+            logger.info(f"✓ Inserted {len(cleaned)} records to resource {resource_id}")
             return True
         logger.error(f"datastore_create failed: {result.get('error')}")
         return False
@@ -223,8 +229,7 @@ def create_resource_view(resource_id: str) -> bool:
         resp.raise_for_status()
         result = resp.json()
         if result.get('success'):
-            print("✓ Resource metadata and download URL updated")
-            logger.info(f"Created datatables_view for resource {resource_id}")
+            logger.info(f"✓ Created datatables_view for resource {resource_id}")
             return True
         logger.warning(f"resource_view_create failed: {result.get('error')}")
         return False
@@ -234,22 +239,21 @@ def create_resource_view(resource_id: str) -> bool:
 
 
 def main():
-    print("=== CKAN SITES DATASTORE APPENDER ===")
-    print(f"Dataset: {DATASET_ID}")
-    print(f"CSV file: {CSV_FILE_PATH}")
+    logger.info("=== CKAN SITES DATASTORE APPENDER ===")
+    logger.info(f"Dataset: {DATASET_ID}")
+    logger.info(f"CSV file: {CSV_FILE_PATH}")
 
     if not os.path.exists(CSV_FILE_PATH):
-        print(f"✗ CSV file '{CSV_FILE_PATH}' not found!")
+        logger.error(f"✗ CSV file '{CSV_FILE_PATH}' not found!")
         return False
 
-    print("Reading CSV file...")
+    logger.info("Reading CSV file...")
     try:
         new_df = pd.read_csv(CSV_FILE_PATH)
-        print(f"  Rows: {len(new_df)}")
-        print(f"  Columns: {', '.join(new_df.columns)}")
+        logger.info(f"  Rows: {len(new_df)}")
+        logger.info(f"  Columns: {', '.join(new_df.columns)}")
     except Exception as e:
-        print(f"✗ Error reading CSV: {e}")
-        logger.error(f"Cannot read {CSV_FILE_PATH}: {e}")
+        logger.error(f"✗ Cannot read {CSV_FILE_PATH}: {e}")
         return False
 
     resource = find_resource()
@@ -258,46 +262,47 @@ def main():
 
     if existing_df.empty:
         merged_df = new_df.copy()
-        print(f"  No existing data, all {len(merged_df)} records are new")
+        logger.info(f"  No existing data, all {len(merged_df)} records are new")
     else:
         merged_df = pd.concat([existing_df, new_df], ignore_index=True)
-        print(f"  Appended: {len(existing_df)} existing + {len(new_df)} new = {len(merged_df)} total rows")
+        logger.info(f"  Appended: {len(existing_df)} existing + {len(new_df)} new = {len(merged_df)} total rows")
 
     if resource:
-        delete_resource_views(resource['id'])
+        deleted = delete_resource_views(resource['id'])
+        if deleted:
+            logger.info(f"  Deleted {sum(deleted.values())}/{len(deleted)} resource views")
         if not delete_resource(resource['id']):
-            print("✗ Failed to delete old resource — aborting to avoid data loss")
-            logger.error("Failed to delete old resource")
+            logger.error("✗ Failed to delete old resource — aborting to avoid data loss")
             return False
         time.sleep(2)
 
     new_id = create_resource()
     if not new_id:
-        print("✗ Resource creation failed")
+        logger.error("✗ Resource creation failed")
         return False
 
     success = push_to_datastore(new_id, merged_df)
     if not success:
-        print("✗ Failed to push data to datastore")
+        logger.error("✗ Failed to push data to datastore")
         return False
 
     create_resource_view(new_id)
 
-    print(f"\n✓ Data successfully appended!")
-    print(f"View dataset: {CKAN_URL}/dataset/{DATASET_ID}")
+    logger.info(f"✓ Data successfully appended!")
+    logger.info(f"View dataset: {CKAN_URL}/dataset/{DATASET_ID}")
     return True
 
 
 if __name__ == '__main__':
     if len(sys.argv) > 1:
         CSV_FILE_PATH = sys.argv[1]
-        print(f"Using CSV file: {CSV_FILE_PATH}")
+        logger.info(f"Using CSV file: {CSV_FILE_PATH}")
 
     success = main()
 
     if success:
-        print("\n=== APPEND COMPLETE ===")
+        logger.info("=== APPEND COMPLETE ===")
         sys.exit(0)
     else:
-        print("\n=== APPEND FAILED ===")
+        logger.error("=== APPEND FAILED ===")
         sys.exit(1)
@@ -9,22 +9,58 @@ the CKAN ecosystem catalog with the metadata.
 
 import sys
 import os
+import argparse
+import glob
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import cloudscraper
 import yaml
-import json
-import time
+from urllib3.util.retry import Retry
+import orjson
+import re
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, Optional, List
 from urllib.parse import urlparse
-from config import USER_AGENT, CKAN_BASE_URL
+from config import USER_AGENT, CKAN_BASE_URL, MAX_CONNECTIONS_PER_HOST
+
+logger = logging.getLogger(__name__)
+
+# Prefer the libyaml-backed loader; PyYAML wheels ship it, source builds may not
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
 
 # Configuration
 CKAN_API_KEY = os.getenv('CKAN_API_KEY', '')
+MAX_WORKERS = MAX_CONNECTIONS_PER_HOST  # Extensions (or package_search pages) fetched at once
+PAGE_SIZE = 1000
+# ckan_ecosystem.yaml keys copied as-is onto the CKAN package
+YAML_FIELD_KEYS = (
+    'title', 'notes', 'detailed_info', 'publisher', 'extension_type', 'license',
+    'contact_name', 'contact_email', 'url', 'organization_url',
+)
+# owner/repo from a GitHub repository URL, ignoring .git, deeper paths, query and fragment
+GITHUB_REPO_PATTERN = re.compile(
+    r'^https?://(?:www\.)?github\.com/([^/?#\s]+)/([^/?#\s]+?)(?:\.git)?/*(?:[/?#].*)?$',
+    re.IGNORECASE
+)
+# Raw YAML bodies with their ETags, revalidated with If-None-Match on every run
+YAML_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'raw_yaml')
+# Outcomes of process_extension, counted separately in the summary
+STATUS_UPDATED = 'updated'
+STATUS_UNCHANGED = 'unchanged'
+STATUS_DRY_RUN = 'dry-run'
+STATUS_FAILED = 'failed'
 
 
 class EcosystemYAMLUpdater:
-    def __init__(self):
+    def __init__(self, fixture_dir: Optional[str] = None):
+        # With a fixture directory, catalog records and YAML come from local files
+        # and patches are only printed; nothing goes over the network
+        self.fixture_dir = fixture_dir
         self.base_url = CKAN_BASE_URL
         self.api_base = f"{self.base_url}/api/3/action"
         self.session = cloudscraper.create_scraper()
@@ -34,52 +70,80 @@ class EcosystemYAMLUpdater:
             headers['Authorization'] = CKAN_API_KEY
         self.session.headers.update(headers)
 
+        # One pool per host (catalog and raw.githubusercontent.com), sized for the
+        # workers, with backoff on rate limits and gateway errors. The adapter keeps
+        # cloudscraper's TLS context; 503 is left to its Cloudflare challenge handling.
+        self.session.mount('https://', cloudscraper.CipherSuiteAdapter(
+            ssl_context=self.session.get_adapter('https://').ssl_context,
+            pool_connections=4,
+            pool_maxsize=MAX_WORKERS,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=[429, 500, 502, 504],
+                allowed_methods=['GET', 'POST'],
+                raise_on_status=False
+            )
+        ))
+
+        # Runs the main/master branch probes side by side
+        self.probe_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS * 2)
+
         self.processed_count = 0
         self.error_count = 0
 
-    def get_all_extensions(self) -> List[str]:
-        """Fetch all extension package names from CKAN catalog"""
-        print("Fetching all extensions from catalog...")
-
-        all_names = []
-        start = 0
-        rows = 1000
+    def fetch_extensions_page(self, start: int, rows: int = PAGE_SIZE) -> Optional[Dict]:
+        """Fetch one page of extension packages, returns the package_search result or None"""
+        response = self.session.get(
+            f"{self.api_base}/package_search",
+            params={
+                'fq': 'type:extension',
+                'start': start,
+                'rows': rows,
+                'sort': 'name asc',  # Stable order so concurrent pages don't overlap
+                'fl': 'name',  # Only names are used; skips the full package dicts
+                'include_private': False
+            }
+        )
+
+        if response.status_code != 200:
+            logger.error(f"API failed with status {response.status_code} (start={start})")
+            return None
 
-        while True:
-            response = self.session.get(
-                f"{self.api_base}/package_search",
-                params={
-                    'fq': 'type:extension',
-                    'start': start,
-                    'rows': rows,
-                    'include_private': False
-                }
-            )
+        data = orjson.loads(response.content)
+        if not data.get('success'):
+            logger.error(f"API returned error (start={start})")
+            return None
 
-            if response.status_code != 200:
-                print(f"API failed with status {response.status_code}")
-                break
+        return data['result']
 
-            data = response.json()
-            if not data.get('success'):
-                print("API returned error")
-                break
+    def get_all_extensions(self) -> List[str]:
+        """Fetch all extension package names from CKAN catalog"""
+        if self.fixture_dir:
+            pattern = os.path.join(self.fixture_dir, '*.catalog.json')
+            return sorted(os.path.basename(path)[:-len('.catalog.json')] for path in glob.glob(pattern))
 
-            result = data['result']
-            batch = result.get('results', [])
-            total_count = result.get('count', 0)
+        logger.info("Fetching all extensions from catalog...")
 
-            for pkg in batch:
-                all_names.append(pkg.get('name', ''))
+        # The first page also gives the total count
+        first_page = self.fetch_extensions_page(0)
+        total_count = first_page.get('count', 0) if first_page else 0
+        if total_count == 0:
+            logger.warning("No extensions found")
+            return []
 
-            print(f"Fetched {len(all_names)}/{total_count} extensions")
+        pages = [first_page]
 
-            if len(batch) < rows or len(all_names) >= total_count:
-                break
+        # Remaining pages are independent, so fetch them concurrently
+        starts = range(PAGE_SIZE, total_count, PAGE_SIZE)
+        if starts:
+            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+                pages.extend(page for page in executor.map(self.fetch_extensions_page, starts) if page)
 
-            start += rows
+        all_names = [pkg.get('name', '') for page in pages for pkg in page.get('results', [])]
+        logger.info(f"Fetched {len(all_names)}/{total_count} extensions")
 
-        print(f"Total extensions found: {len(all_names)}")
+        logger.info(f"Total extensions found: {len(all_names)}")
         return all_names
 
     def get_extension_from_catalog(self, extension_identifier: str) -> Optional[Dict]:
@@ -99,7 +163,10 @@ class EcosystemYAMLUpdater:
         else:
             extension_name = extension_identifier
 
-        print(f"  Fetching catalog data for: {extension_name}")
+        if self.fixture_dir:
+            return self.load_fixture(f"{extension_name}.catalog.json")
+
+        logger.debug(f"  Fetching catalog data for: {extension_name}")
 
         try:
             response = self.session.get(
@@ -108,16 +175,35 @@ class EcosystemYAMLUpdater:
             )
 
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 if data.get('success'):
-                    print(f"  Found extension in catalog: {extension_name}")
+                    logger.debug(f"  Found extension in catalog: {extension_name}")
                     return data['result']
 
-            print(f"  Extension not found in catalog: {extension_name}")
+            logger.warning(f"{extension_name}: not found in catalog")
             return None
 
         except Exception as e:
-            print(f"  Error fetching extension from catalog: {str(e)}")
+            logger.error(f"{extension_name}: error fetching extension from catalog: {str(e)}")
+            return None
+
+    def load_fixture(self, filename: str):
+        """
+        Read a catalog record (.catalog.json) or ckan_ecosystem.yaml (.yaml)
+        from the fixture directory.
+
+        Returns:
+            Parsed content, or None if the file is missing.
+        """
+        path = os.path.join(self.fixture_dir, filename)
+        logger.debug(f"  Reading fixture: {path}")
+        try:
+            with open(path, 'rb') as f:
+                if filename.endswith('.json'):
+                    return orjson.loads(f.read())
+                return yaml.load(f, Loader=SafeLoader)
+        except FileNotFoundError:
+            logger.warning(f"  Fixture not found: {path}")
             return None
 
     def construct_raw_yaml_urls(self, github_url: str) -> List[str]:
@@ -126,45 +212,88 @@ class EcosystemYAMLUpdater:
 
         Tries main branch first, then master.
         """
-        github_url = github_url.rstrip('/')
-        parsed = urlparse(github_url)
-        path_parts = parsed.path.strip('/').split('/')
-
-        if len(path_parts) >= 2:
-            owner = path_parts[0]
-            repo = path_parts[1]
-            return [
-                f"https://raw.githubusercontent.com/{owner}/{repo}/main/ckan_ecosystem.yaml",
-                f"https://raw.githubusercontent.com/{owner}/{repo}/master/ckan_ecosystem.yaml"
-            ]
+        match = GITHUB_REPO_PATTERN.match(github_url.strip())
+        if not match:
+            return []
+
+        owner, repo = match.groups()
+        return [
+            f"https://raw.githubusercontent.com/{owner}/{repo}/{branch}/ckan_ecosystem.yaml"
+            for branch in ('main', 'master')
+        ]
+
+    def _yaml_cache_path(self, raw_url: str) -> str:
+        # raw.githubusercontent.com/<owner>/<repo>/<branch>/ckan_ecosystem.yaml
+        owner, repo, branch = urlparse(raw_url).path.strip('/').split('/')[:3]
+        return os.path.join(YAML_CACHE_DIR, f"{owner}_{repo}_{branch}.json")
+
+    def _read_yaml_cache(self, path: str) -> Optional[Dict]:
+        try:
+            with open(path, 'rb') as f:
+                return orjson.loads(f.read())
+        except (OSError, ValueError):
+            return None
 
-        return []
+    def _write_yaml_cache(self, path: str, etag: str, text: str):
+        try:
+            os.makedirs(YAML_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(orjson.dumps({'etag': etag, 'text': text}))
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def get_raw_file(self, raw_url: str) -> Optional[str]:
+        """Return the body of a raw GitHub file, or None if it is missing"""
+        cache_path = self._yaml_cache_path(raw_url)
+        cached = self._read_yaml_cache(cache_path)
+        headers = {'If-None-Match': cached['etag']} if cached else None
+        try:
+            response = self.session.get(raw_url, headers=headers, timeout=10)
+            if response.status_code == 304 and cached:
+                return cached['text']
+            if response.status_code == 200:
+                etag = response.headers.get('ETag')
+                if etag:
+                    self._write_yaml_cache(cache_path, etag, response.text)
+                return response.text
+        except Exception:
+            pass
+        return None
 
     def fetch_yaml_from_github(self, github_url: str) -> Optional[Dict]:
         """
         Fetch and parse ckan_ecosystem.yaml from a GitHub repository.
 
+        Both branch candidates are requested at once; main still wins when
+        both exist.
+
         Returns:
             Parsed YAML content dict, or None if not found.
         """
-        print(f"  Looking for ckan_ecosystem.yaml in repository...")
+        logger.debug(f"  Looking for ckan_ecosystem.yaml in repository...")
 
         raw_urls = self.construct_raw_yaml_urls(github_url)
-
+        futures = []
         for raw_url in raw_urls:
-            try:
-                print(f"    Trying: {raw_url}")
-                response = self.session.get(raw_url, timeout=10)
-
-                if response.status_code == 200:
-                    yaml_content = yaml.safe_load(response.text)
-                    print(f"  Found and parsed ckan_ecosystem.yaml")
-                    return yaml_content
+            logger.debug(f"    Trying: {raw_url}")
+            futures.append(self.probe_pool.submit(self.get_raw_file, raw_url))
 
+        for future in futures:
+            text = future.result()
+            if text is None:
+                continue
+            try:
+                yaml_content = yaml.load(text, Loader=SafeLoader)
             except Exception:
                 continue
+            logger.debug(f"  Found and parsed ckan_ecosystem.yaml")
+            for pending in futures:
+                pending.cancel()
+            return yaml_content
 
-        print(f"  ckan_ecosystem.yaml not found in repository")
+        logger.debug(f"  ckan_ecosystem.yaml not found in repository")
         return None
 
     def map_yaml_to_ckan_fields(self, yaml_data: Dict, existing_data: Dict) -> Dict:
@@ -176,52 +305,49 @@ class EcosystemYAMLUpdater:
             existing_data: Existing package data from CKAN.
 
         Returns:
-            Updated package data ready for CKAN API.
+            package_patch payload holding the package id and only the
+            fields whose value differs from the catalog.
         """
-        print("  Mapping YAML metadata to CKAN fields...")
-
-        updated_data = existing_data.copy()
-
-        # Direct field mappings
-        field_mapping = {
-            'title': 'title',
-            'notes': 'notes',
-            'detailed_info': 'detailed_info',
-            'publisher': 'publisher',
-            'extension_type': 'extension_type',
-            'license': 'license',
-            'contact_name': 'contact_name',
-            'contact_email': 'contact_email',
-            'url': 'url',
-            'organization_url': 'organization_url',
-        }
-
-        for yaml_key, ckan_key in field_mapping.items():
-            if yaml_key in yaml_data and yaml_data[yaml_key]:
-                value = yaml_data[yaml_key]
-                if isinstance(value, str):
-                    value = value.strip()
-                if value:
-                    updated_data[ckan_key] = value
-                    print(f"    Updated {ckan_key}")
+        logger.debug("  Mapping YAML metadata to CKAN fields...")
+
+        updated_data = {'id': existing_data['name']}
+
+        # Direct field mappings (YAML keys match the CKAN field names)
+        for key in YAML_FIELD_KEYS:
+            value = yaml_data.get(key)
+            if isinstance(value, str):
+                value = value.strip()
+            if value and value != existing_data.get(key):
+                updated_data[key] = value
+                logger.debug(f"    Updated {key}")
 
         # Handle tags (list -> CKAN tag dicts)
         if 'tags' in yaml_data and yaml_data['tags']:
             tags = yaml_data['tags']
             if isinstance(tags, list):
                 tags = [tag for tag in tags if tag and str(tag).strip()]
-                if tags:
-                    updated_data['tags'] = [{'name': str(tag).strip()} for tag in tags]
-                    print(f"    Updated tags: {', '.join(str(t) for t in tags)}")
+                tag_names = [str(tag).strip() for tag in tags]
+                existing_tags = [tag.get('name') for tag in existing_data.get('tags', [])]
+                if tag_names and sorted(tag_names) != sorted(existing_tags):
+                    updated_data['tags'] = [{'name': name} for name in tag_names]
+                    logger.debug(f"    Updated tags: {', '.join(tag_names)}")
 
         # Handle CKAN version compatibility
         if 'ckan_version' in yaml_data and yaml_data['ckan_version']:
             versions = yaml_data['ckan_version']
             if isinstance(versions, list):
-                versions = [str(v) for v in versions if v]
-                if versions:
+                # Unquoted YAML versions arrive as floats (2.10 -> 2.1), so only strings are trusted
+                # and a list holding any other type is left out of the patch entirely
+                rejected = [v for v in versions if v and not isinstance(v, str)]
+                versions = [v.strip() for v in versions if isinstance(v, str) and v.strip()]
+                existing_versions = existing_data.get('ckan_version') or []
+                if isinstance(existing_versions, str):
+                    existing_versions = [existing_versions]
+                if rejected:
+                    logger.warning(f"    Skipping ckan_version: non-string entries {rejected}, quote them in the YAML")
+                elif versions and sorted(versions) != sorted(map(str, existing_versions)):
                     updated_data['ckan_version'] = versions
-                    print(f"    Updated CKAN versions: {', '.join(versions)}")
+                    logger.debug(f"    Updated CKAN versions: {', '.join(versions)}")
 
         return updated_data
 
@@ -232,34 +358,38 @@ class EcosystemYAMLUpdater:
         Returns:
             True if successful.
         """
-        print(f"  Updating catalog for: {package_data.get('name')}")
+        logger.debug(f"  Updating catalog for: {package_data.get('id')}")
+
+        if self.fixture_dir:
+            logger.info(f"  Dry run, would send package_patch:\n"
+                        f"{orjson.dumps(package_data, option=orjson.OPT_INDENT_2).decode()}")
+            return True
 
         try:
             response = self.session.post(
                 f"{self.api_base}/package_patch",
-                data=json.dumps(package_data),
+                data=orjson.dumps(package_data),
                 headers={'Content-Type': 'application/json'}
             )
 
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 if data.get('success'):
-                    print(f"  Successfully updated extension in catalog")
+                    logger.debug(f"  Successfully updated extension in catalog")
                     return True
                 else:
                     error = data.get('error', {})
-                    print(f"  API returned error: {error}")
+                    logger.error(f"{package_data.get('id')}: API returned error: {error}")
                     return False
             else:
-                print(f"  HTTP error: {response.status_code}")
-                print(f"    Response: {response.text[:200]}")
+                logger.error(f"{package_data.get('id')}: HTTP error {response.status_code}: {response.text[:200]}")
                 return False
 
         except Exception as e:
-            print(f"  Error updating catalog: {str(e)}")
+            logger.error(f"{package_data.get('id')}: error updating catalog: {str(e)}")
             return False
 
-    def process_extension(self, extension_identifier: str, auto_confirm: bool = False) -> bool:
+    def process_extension(self, extension_identifier: str, auto_confirm: bool = False) -> str:
         """
         Complete workflow to process a single extension.
 
@@ -268,62 +398,69 @@ class EcosystemYAMLUpdater:
             auto_confirm: Skip interactive confirmation prompt.
 
         Returns:
-            True if successful.
+            One of STATUS_UPDATED, STATUS_UNCHANGED, STATUS_DRY_RUN or STATUS_FAILED.
         """
-        print(f"\n{'='*70}")
-        print(f"Processing: {extension_identifier}")
-        print(f"{'='*70}\n")
+        logger.debug(f"{'='*70}")
+        logger.debug(f"Processing: {extension_identifier}")
+        logger.debug(f"{'='*70}")
 
         # Step 1: Get extension from catalog
         catalog_data = self.get_extension_from_catalog(extension_identifier)
         if not catalog_data:
-            return False
+            return STATUS_FAILED
 
         # Step 2: Get GitHub URL
         github_url = catalog_data.get('url', '')
         if not github_url or 'github.com' not in github_url:
-            print(f"  No GitHub URL found in catalog metadata")
-            return False
+            logger.info(f"{extension_identifier}: no GitHub URL found in catalog metadata")
+            return STATUS_FAILED
 
-        print(f"  GitHub URL: {github_url}")
+        logger.debug(f"  GitHub URL: {github_url}")
 
         # Step 3: Fetch YAML from GitHub
-        yaml_data = self.fetch_yaml_from_github(github_url)
+        if self.fixture_dir:
+            yaml_data = self.load_fixture(f"{catalog_data.get('name')}.yaml")
+        else:
+            yaml_data = self.fetch_yaml_from_github(github_url)
         if not yaml_data:
-            print(f"  Skipping update - no ckan_ecosystem.yaml found")
-            return False
+            logger.info(f"{extension_identifier}: skipping update - no ckan_ecosystem.yaml found")
+            return STATUS_FAILED
 
         # Step 4: Map YAML to CKAN fields
         updated_data = self.map_yaml_to_ckan_fields(yaml_data, catalog_data)
 
+        if len(updated_data) == 1:
+            logger.info(f"{extension_identifier}: catalog already matches ckan_ecosystem.yaml, nothing to update")
+            return STATUS_UNCHANGED
+
         # Step 5: Preview changes
-        print(f"\n  Metadata Preview:")
-        print(f"    Title: {updated_data.get('title', 'N/A')}")
-        print(f"    Type: {updated_data.get('extension_type', 'N/A')}")
-        print(f"    License: {updated_data.get('license', 'N/A')}")
-        print(f"    Publisher: {updated_data.get('publisher', 'N/A')}")
-        ckan_versions = updated_data.get('ckan_version', [])
+        preview = {**catalog_data, **updated_data}
+        logger.debug(f"  Metadata Preview:")
+        logger.debug(f"    Title: {preview.get('title', 'N/A')}")
+        logger.debug(f"    Type: {preview.get('extension_type', 'N/A')}")
+        logger.debug(f"    License: {preview.get('license', 'N/A')}")
+        logger.debug(f"    Publisher: {preview.get('publisher', 'N/A')}")
+        ckan_versions = preview.get('ckan_version', [])
         if isinstance(ckan_versions, list):
-            print(f"    CKAN Versions: {', '.join(str(v) for v in ckan_versions) or 'N/A'}")
+            logger.debug(f"    CKAN Versions: {', '.join(str(v) for v in ckan_versions) or 'N/A'}")
 
         # Step 6: Confirm update
         if not auto_confirm:
             confirm = input(f"\n  Update this extension in the catalog? (y/n): ").strip().lower()
             if confirm != 'y':
-                print(f"  Skipped by user")
-                return False
+                logger.info(f"{extension_identifier}: skipped by user")
+                return STATUS_FAILED
 
         # Step 7: Update catalog
-        success = self.update_catalog_extension(updated_data)
-
-        if success:
-            print(f"\n  Extension updated successfully!")
-            print(f"    View at: {self.base_url}/extension/{updated_data.get('name')}")
+        if not self.update_catalog_extension(updated_data):
+            return STATUS_FAILED
 
-        # Brief pause between API calls
-        time.sleep(0.5)
+        if self.fixture_dir:
+            logger.info(f"{extension_identifier}: dry run, catalog not changed")
+            return STATUS_DRY_RUN
 
-        return success
+        logger.info(f"{extension_identifier}: updated successfully, view at {self.base_url}/extension/{catalog_data.get('name')}")
+        return STATUS_UPDATED
 
 
 def get_extensions_to_process(updater: EcosystemYAMLUpdater) -> List[str]:
@@ -361,17 +498,32 @@ def get_extensions_to_process(updater: EcosystemYAMLUpdater) -> List[str]:
     return extensions
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='CKAN Ecosystem YAML Metadata Updater')
+    parser.add_argument('--fixture-dir', metavar='DIR',
+                        help='Read <name>.catalog.json and <name>.yaml from DIR instead of '
+                             'the catalog and GitHub, and print patches without sending them')
+    return parser.parse_args()
+
+
 def main():
     """Main execution function"""
+    args = parse_args()
+
+    # Per-step detail is DEBUG and one result line per extension is INFO. Interactive
+    # sessions show the detail by default; piped CI runs default to the result lines.
+    default_level = 'DEBUG' if sys.stdin.isatty() else 'INFO'
+    logging.basicConfig(format='%(message)s', stream=sys.stdout)
+    logger.setLevel(os.getenv('LOG_LEVEL', default_level).upper())
 
     # Check for API key
-    if not CKAN_API_KEY:
-        print("WARNING: CKAN_API_KEY not set!")
-        print("  Set it via environment variable or you may not be able to update the catalog.")
-        print("  Example: export CKAN_API_KEY='your-api-key-here'\n")
+    if not CKAN_API_KEY and not args.fixture_dir:
+        logger.warning("WARNING: CKAN_API_KEY not set!")
+        logger.warning("  Set it via environment variable or you may not be able to update the catalog.")
+        logger.warning("  Example: export CKAN_API_KEY='your-api-key-here'")
 
     # Initialize updater
-    updater = EcosystemYAMLUpdater()
+    updater = EcosystemYAMLUpdater(fixture_dir=args.fixture_dir)
 
     auto_confirm = os.getenv('AUTO_CONFIRM', '').lower() == 'true'
 
@@ -380,7 +532,7 @@ def main():
         # Non-interactive mode: read from stdin
         user_input = sys.stdin.read().strip()
         if not user_input:
-            print("No extensions provided via stdin")
+            logger.warning("No extensions provided via stdin")
             return
         if user_input.lower() == 'all':
             extensions = updater.get_all_extensions()
@@ -391,39 +543,59 @@ def main():
         extensions = get_extensions_to_process(updater)
 
     if not extensions:
-        print("No extensions to process")
+        logger.warning("No extensions to process")
         return
 
-    print(f"\nExtensions to process: {len(extensions)}")
+    logger.info(f"Extensions to process: {len(extensions)}")
     for ext in extensions:
-        print(f"  - {ext}")
+        logger.debug(f"  - {ext}")
 
     # Process each extension
-    success_count = 0
-    failed_count = 0
-
-    for extension in extensions:
-        try:
-            success = updater.process_extension(extension, auto_confirm=auto_confirm)
-            if success:
-                success_count += 1
-            else:
-                failed_count += 1
-        except KeyboardInterrupt:
-            print("\n\nProcess interrupted by user")
-            break
-        except Exception as e:
-            print(f"\nUnexpected error processing {extension}: {str(e)}")
-            failed_count += 1
+    status_counts = dict.fromkeys((STATUS_UPDATED, STATUS_UNCHANGED, STATUS_DRY_RUN, STATUS_FAILED), 0)
+
+    if auto_confirm and len(extensions) > 1:
+        # No prompts to wait on, so overlap the catalog and GitHub round-trips;
+        # the pool size caps concurrent requests against the catalog
+        logger.info(f"Processing with {MAX_WORKERS} workers...")
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            future_to_extension = {
+                executor.submit(updater.process_extension, extension, True): extension
+                for extension in extensions
+            }
+            try:
+                for future in as_completed(future_to_extension):
+                    try:
+                        status = future.result()
+                    except Exception as e:
+                        logger.error(f"Unexpected error processing {future_to_extension[future]}: {str(e)}")
+                        status = STATUS_FAILED
+                    status_counts[status] += 1
+            except KeyboardInterrupt:
+                logger.warning("Process interrupted by user")
+                for future in future_to_extension:
+                    future.cancel()
+    else:
+        for extension in extensions:
+            try:
+                status_counts[updater.process_extension(extension, auto_confirm=auto_confirm)] += 1
+            except KeyboardInterrupt:
+                logger.warning("Process interrupted by user")
+                break
+            except Exception as e:
+                logger.error(f"Unexpected error processing {extension}: {str(e)}")
+                status_counts[STATUS_FAILED] += 1
 
     # Summary
-    print(f"\n{'='*70}")
-    print("SUMMARY")
-    print(f"{'='*70}")
-    print(f"Successfully updated: {success_count}")
-    print(f"Failed: {failed_count}")
-    print(f"Total processed: {success_count + failed_count}")
-    print(f"{'='*70}\n")
+    logger.info(f"{'='*70}")
+    logger.info("SUMMARY")
+    logger.info(f"{'='*70}")
+    logger.info(f"Successfully updated: {status_counts[STATUS_UPDATED]}")
+    logger.info(f"Already up to date: {status_counts[STATUS_UNCHANGED]}")
+    if args.fixture_dir:
+        logger.info(f"Dry run, not sent: {status_counts[STATUS_DRY_RUN]}")
+    logger.info(f"Failed: {status_counts[STATUS_FAILED]}")
+    logger.info(f"Total processed: {sum(status_counts.values())}")
+    logger.info(f"{'='*70}")
 
 
 if __name__ == "__main__":